@@ -3,8 +3,7 @@ import pandas as pd
 import sqlite3
 import os
 import io
-import json
-from datetime import datetime
+import csv
 
 # Set page configuration
 st.set_page_config(
@@ -13,38 +12,399 @@ st.set_page_config(
     layout="wide"
 )
 
-# Create database directory if it doesn't exist
-if not os.path.exists('data'):
-    os.makedirs('data')
+# Function to open the database connection once per process, shared by every
+# rerun, fragment and session
+@st.cache_resource
+def get_conn():
+    # Create database directory if it doesn't exist
+    os.makedirs('data', exist_ok=True)
+    conn = sqlite3.connect('data/teaching_analytics.db', check_same_thread=False)
+    
+    # WAL journaling with NORMAL sync commits each import with a single WAL write
+    # instead of rewriting the rollback journal; temp b-trees stay in memory and
+    # the 64 MB page cache stays warm across reruns
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+    """)
+    return conn
+
+# Database connection, shared across reruns; each query below opens its own
+# short-lived cursor so concurrent sessions never share cursor state
+conn = get_conn()
+
+# Rows parsed from a CSV upload for its preview, and per chunk when importing it
+PREVIEW_ROWS = 5
+CSV_CHUNK_ROWS = 50000
+
+# Date and low-cardinality columns of each table, normalized on ingest
+DATE_COLUMNS = {
+    "clients": ["first_engagement_date", "last_engagement_date"],
+    "programs": ["creation_date", "last_updated"],
+    "enrollments": ["start_date", "end_date"],
+    "opportunities": ["expected_close_date", "actual_close_date", "created_date", "last_updated"]
+}
+CATEGORY_COLUMNS = {
+    "clients": ["industry", "size", "region"],
+    "programs": ["category", "delivery_mode"],
+    "enrollments": ["delivery_mode", "status"],
+    "opportunities": ["stage", "owner"]
+}
+
+# Function to normalize an upload's dtypes before it is inserted: dates are parsed
+# and stored as YYYY-MM-DD text, or as YYYY-MM-DD HH:MM:SS when any value in the
+# column carries a time (unparseable values become NULL), repeated labels become
+# categoricals and integer columns are downcast. Floats keep full precision since
+# SQLite stores every REAL as 8 bytes anyway.
+def normalize_upload(df, table):
+    columns = frozenset(df.columns)
+    
+    for col in DATE_COLUMNS[table]:
+        if col in columns:
+            dates = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+            unparsed = dates.isna() & df[col].notna()
+            if unparsed.any():
+                dates[unparsed] = pd.to_datetime(df.loc[unparsed, col], errors="coerce", format="mixed")
+            times = dates.notna() & (dates != dates.dt.normalize())
+            if not times.any():
+                date_format = "%Y-%m-%d"
+            elif (dates.dt.microsecond > 0).any():
+                date_format = "%Y-%m-%d %H:%M:%S.%f"
+            else:
+                date_format = "%Y-%m-%d %H:%M:%S"
+            df[col] = dates.dt.strftime(date_format)
+    
+    for col in CATEGORY_COLUMNS[table]:
+        if col in columns:
+            df[col] = df[col].astype("category")
+    
+    integer_columns = df.select_dtypes("integer").columns
+    df[integer_columns] = df[integer_columns].apply(pd.to_numeric, downcast="integer")
+    return df
+
+# Function to insert a frame with one prepared INSERT bound to every row,
+# skipping to_sql's per-row coercion; SQLite assigns the primary key when the
+# frame doesn't carry one. The caller owns the transaction.
+def executemany_insert(table, df):
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    placeholders = ", ".join("?" * len(df.columns))
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+# Function to append an uploaded file to a table. CSVs are re-read in chunks so
+# memory stays bounded by the chunk size rather than the file. Every chunk is
+# inserted inside one transaction, so a failed import leaves the table unchanged.
+# Other formats insert the parsed frame.
+def import_upload(file, file_extension, table, df):
+    if file_extension == "csv":
+        file.seek(0)
+        chunks = pd.read_csv(file, chunksize=CSV_CHUNK_ROWS)
+    else:
+        chunks = [df]
+    
+    imported_count = 0
+    with conn:
+        for chunk in chunks:
+            chunk = normalize_upload(chunk, table)
+            executemany_insert(table, chunk)
+            imported_count += len(chunk)
+    
+    return imported_count
+
+# Readers for each supported upload format; CSVs only parse the rows needed for
+# the preview here, since import_upload streams the full file
+READERS = {
+    "csv": lambda file: pd.read_csv(file, nrows=PREVIEW_ROWS),
+    "xlsx": pd.read_excel,
+    "json": pd.read_json
+}
 
-# Database connection
-conn = sqlite3.connect('data/teaching_analytics.db')
-cursor = conn.cursor()
+# Function to read an uploaded file with the reader for its extension
+def load_uploaded(file):
+    file_extension = file.name.rsplit(".", 1)[-1].lower()
+    return file_extension, READERS[file_extension](file)
+
+# Function to preview and validate an upload, and import it into its table on request
+def import_table(file, table, required_columns, label):
+    file_extension, df = load_uploaded(file)
+    
+    # Display preview
+    st.write("Data Preview:")
+    st.dataframe(df.head())
+    
+    # Validation
+    columns = frozenset(df.columns)
+    missing_columns = [col for col in required_columns if col not in columns]
+    
+    if missing_columns:
+        st.error(f"Missing required columns: {', '.join(missing_columns)}")
+    elif st.button(f"Import {label} Data"):
+        # Insert the whole upload in one transaction; SQLite assigns the primary
+        # key when the upload doesn't provide one
+        try:
+            imported_count = import_upload(file, file_extension, table, df)
+        except sqlite3.Error as e:
+            st.error(f"Error importing {label.lower()} data, no records were imported: {e}")
+            return
+        
+        # Rerun the whole app, not just this tab's fragment, so the statistics and
+        # exports below pick up the new rows; that run reports the import
+        st.session_state[f"imported_{table}"] = imported_count
+        st.rerun(scope="app")
+    
+    # Report an import committed by the previous run
+    imported_count = st.session_state.pop(f"imported_{table}", None)
+    if imported_count is not None:
+        st.success(f"Successfully imported {imported_count} {label.lower()} records!")
+        
+        # Display current data count
+        count = get_table_count(table, get_db_version())
+        st.info(f"Total {table} in database: {count}")
 
 # Function to create database schema
 def create_database_schema():
     with open('docs/database_schema.sql', 'r') as f:
         schema_script = f.read()
     
-    # Split the script by semicolons to execute each statement separately
-    statements = schema_script.split(';')
-    for statement in statements:
-        if statement.strip():
-            try:
-                cursor.execute(statement)
-            except sqlite3.Error as e:
-                st.error(f"Error executing SQL statement: {e}")
+    # Let SQLite parse and run the whole script, which also handles semicolons
+    # inside string literals and trigger bodies
+    try:
+        conn.executescript(schema_script)
+    except sqlite3.Error as e:
+        st.error(f"Error executing SQL statement: {e}")
     
     conn.commit()
 
+# Function to index the foreign keys, stages and dates the analyzers filter,
+# join and group on; IF NOT EXISTS makes it safe on databases created earlier.
+# Stage lookups go through the analyzer's idx_opp_stage_close, which leads with stage
+def create_database_indexes():
+    try:
+        conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_opp_client ON opportunities(client_id, stage);
+            CREATE INDEX IF NOT EXISTS idx_opp_program ON opportunities(program_id, stage);
+            CREATE INDEX IF NOT EXISTS idx_opp_expected_close ON opportunities(expected_close_date);
+            CREATE INDEX IF NOT EXISTS idx_opp_created ON opportunities(created_date);
+            CREATE INDEX IF NOT EXISTS idx_enr_client ON enrollments(client_id);
+            CREATE INDEX IF NOT EXISTS idx_enr_program ON enrollments(program_id);
+            CREATE INDEX IF NOT EXISTS idx_enr_start ON enrollments(start_date);
+        """)
+    except sqlite3.Error as e:
+        st.error(f"Error creating indexes: {e}")
+
 # Function to check if tables exist
 def check_tables_exist():
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='clients'")
-    return cursor.fetchone() is not None
+    return conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='clients'").fetchone() is not None
+
+# Function to detect database changes for cached reads: the modification time of
+# the database file and its WAL, which every committed import advances
+def get_db_version(db_path='data/teaching_analytics.db'):
+    version = os.path.getmtime(db_path)
+    if os.path.exists(db_path + '-wal'):
+        version = max(version, os.path.getmtime(db_path + '-wal'))
+    return version
+
+# Function to count table rows, reused across reruns until the database changes
+@st.cache_data(ttl=60, show_spinner=False)
+def get_table_count(table, db_version):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+# Function to export a table as CSV, reused across reruns until the database changes.
+# Rows are written straight from the cursor without building a DataFrame first.
+@st.cache_data(ttl=60, show_spinner=False)
+def export_table_csv(table, db_version):
+    export_cursor = conn.execute(f"SELECT * FROM {table}")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([column[0] for column in export_cursor.description])
+    writer.writerows(export_cursor)
+    return buffer.getvalue()
+
+# Function to render the client import tab; as a fragment, its widgets rerun only this tab
+@st.fragment
+def import_clients_tab():
+    st.subheader("Import Client Data")
+    
+    # Display expected format
+    with st.expander("Expected Format"):
+        st.write("""
+        Your client data should include the following columns:
+        - client_id (optional, will be auto-generated if not provided)
+        - name (required)
+        - industry
+        - size (Small, Medium, Large, Enterprise)
+        - region
+        - contact_person
+        - email
+        - phone
+        - first_engagement_date (YYYY-MM-DD)
+        - last_engagement_date (YYYY-MM-DD)
+        - total_spend
+        - notes
+        """)
+        
+        # Example data
+        st.code("""
+        Example CSV:
+        name,industry,size,region,contact_person,email
+        Acme Corp,Technology,Large,North,John Smith,john@acme.com
+        Beta Inc,Healthcare,Medium,South,Jane Doe,jane@beta.com
+        """)
+    
+    # File uploader
+    client_file = st.file_uploader("Upload Client Data", type=["csv", "xlsx", "json"], key="client_upload")
+    
+    if client_file is not None:
+        try:
+            import_table(client_file, "clients", ["name"], "Client")
+        except Exception as e:
+            st.error(f"Error importing data: {str(e)}")
+
+# Function to render the program import tab; as a fragment, its widgets rerun only this tab
+@st.fragment
+def import_programs_tab():
+    st.subheader("Import Program Data")
+    
+    # Display expected format
+    with st.expander("Expected Format"):
+        st.write("""
+        Your program data should include the following columns:
+        - program_id (optional, will be auto-generated if not provided)
+        - name (required)
+        - description
+        - category (e.g., Leadership, Technical, Soft Skills)
+        - delivery_mode (In-Person, Virtual, Hybrid)
+        - duration (hours)
+        - base_price
+        - min_participants
+        - max_participants
+        - trainer_cost_per_session
+        - materials_cost_per_participant
+        - active (0 or 1)
+        - creation_date (YYYY-MM-DD)
+        - last_updated (YYYY-MM-DD)
+        """)
+        
+        # Example data
+        st.code("""
+        Example CSV:
+        name,category,delivery_mode,duration,base_price
+        Leadership Essentials,Leadership,In-Person,16,1200
+        Python Programming,Technical,Virtual,24,1500
+        """)
+    
+    # File uploader
+    program_file = st.file_uploader("Upload Program Data", type=["csv", "xlsx", "json"], key="program_upload")
+    
+    if program_file is not None:
+        try:
+            import_table(program_file, "programs", ["name"], "Program")
+        except Exception as e:
+            st.error(f"Error importing data: {str(e)}")
+
+# Function to render the enrollment import tab; as a fragment, its widgets rerun only this tab
+@st.fragment
+def import_enrollments_tab():
+    st.subheader("Import Enrollment Data")
+    
+    # Display expected format
+    with st.expander("Expected Format"):
+        st.write("""
+        Your enrollment data should include the following columns:
+        - enrollment_id (optional, will be auto-generated if not provided)
+        - program_id (required, must exist in programs table)
+        - client_id (required, must exist in clients table)
+        - start_date (YYYY-MM-DD)
+        - end_date (YYYY-MM-DD)
+        - location
+        - delivery_mode (In-Person, Virtual, Hybrid)
+        - num_participants
+        - revenue
+        - trainer_cost
+        - logistics_cost
+        - venue_cost
+        - utilities_cost
+        - materials_cost
+        - status (Scheduled, Completed, Cancelled)
+        - feedback_score
+        - notes
+        """)
+        
+        # Example data
+        st.code("""
+        Example CSV:
+        program_id,client_id,start_date,end_date,num_participants,revenue,trainer_cost,status
+        1,1,2024-01-15,2024-01-16,12,14400,2000,Completed
+        2,2,2024-02-10,2024-02-12,8,12000,1800,Completed
+        """)
+    
+    # File uploader
+    enrollment_file = st.file_uploader("Upload Enrollment Data", type=["csv", "xlsx", "json"], key="enrollment_upload")
+    
+    if enrollment_file is not None:
+        try:
+            import_table(enrollment_file, "enrollments", ["program_id", "client_id"], "Enrollment")
+        except Exception as e:
+            st.error(f"Error importing data: {str(e)}")
+
+# Function to render the opportunity import tab; as a fragment, its widgets rerun only this tab
+@st.fragment
+def import_opportunities_tab():
+    st.subheader("Import Opportunity Data")
+    
+    # Display expected format
+    with st.expander("Expected Format"):
+        st.write("""
+        Your opportunity data should include the following columns:
+        - opportunity_id (optional, will be auto-generated if not provided)
+        - client_id (required, must exist in clients table)
+        - program_id (required, must exist in programs table)
+        - potential_revenue
+        - estimated_participants
+        - stage (Lead, Prospect, Proposal, Negotiation, Closed Won, Closed Lost)
+        - probability (0-100%)
+        - expected_close_date (YYYY-MM-DD)
+        - actual_close_date (YYYY-MM-DD)
+        - created_date (YYYY-MM-DD)
+        - last_updated (YYYY-MM-DD)
+        - owner
+        - notes
+        """)
+        
+        # Example data
+        st.code("""
+        Example CSV:
+        client_id,program_id,potential_revenue,stage,probability,expected_close_date
+        3,1,18000,Proposal,60,2024-05-15
+        4,2,24000,Negotiation,80,2024-04-30
+        """)
+    
+    # File uploader
+    opportunity_file = st.file_uploader("Upload Opportunity Data", type=["csv", "xlsx", "json"], key="opportunity_upload")
+    
+    if opportunity_file is not None:
+        try:
+            import_table(opportunity_file, "opportunities", ["client_id", "program_id"], "Opportunity")
+        except Exception as e:
+            st.error(f"Error importing data: {str(e)}")
+
+# Function to run the one-time database setup once per process rather than on
+# every rerun; the returned flag is popped by the first run that reports it
+@st.cache_resource
+def ensure_database_setup():
+    setup = {'schema_created': False}
+    
+    # Create schema if tables don't exist
+    if not check_tables_exist():
+        create_database_schema()
+        setup['schema_created'] = True
+    
+    create_database_indexes()
+    return setup
 
-# Create schema if tables don't exist
-if not check_tables_exist():
-    create_database_schema()
+if ensure_database_setup().pop('schema_created', False):
     st.success("Database schema created successfully!")
 
 # Main title
@@ -69,371 +429,60 @@ if page == "Data Import":
     tab1, tab2, tab3, tab4 = st.tabs(["Clients", "Programs", "Enrollments", "Opportunities"])
     
     with tab1:
-        st.subheader("Import Client Data")
-        
-        # Display expected format
-        with st.expander("Expected Format"):
-            st.write("""
-            Your client data should include the following columns:
-            - client_id (optional, will be auto-generated if not provided)
-            - name (required)
-            - industry
-            - size (Small, Medium, Large, Enterprise)
-            - region
-            - contact_person
-            - email
-            - phone
-            - first_engagement_date (YYYY-MM-DD)
-            - last_engagement_date (YYYY-MM-DD)
-            - total_spend
-            - notes
-            """)
-            
-            # Example data
-            st.code("""
-            Example CSV:
-            name,industry,size,region,contact_person,email
-            Acme Corp,Technology,Large,North,John Smith,john@acme.com
-            Beta Inc,Healthcare,Medium,South,Jane Doe,jane@beta.com
-            """)
-        
-        # File uploader
-        client_file = st.file_uploader("Upload Client Data", type=["csv", "xlsx", "json"], key="client_upload")
-        
-        if client_file is not None:
-            try:
-                # Determine file type and read accordingly
-                file_extension = client_file.name.split(".")[-1].lower()
-                
-                if file_extension == "csv":
-                    df = pd.read_csv(client_file)
-                elif file_extension == "xlsx":
-                    df = pd.read_excel(client_file)
-                elif file_extension == "json":
-                    df = pd.read_json(client_file)
-                
-                # Display preview
-                st.write("Data Preview:")
-                st.dataframe(df.head())
-                
-                # Validation
-                required_columns = ["name"]
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    st.error(f"Missing required columns: {', '.join(missing_columns)}")
-                else:
-                    # Import button
-                    if st.button("Import Client Data"):
-                        # Prepare data for import
-                        if "client_id" not in df.columns:
-                            # Get the next available ID
-                            cursor.execute("SELECT MAX(client_id) FROM clients")
-                            max_id = cursor.fetchone()[0]
-                            start_id = 1 if max_id is None else max_id + 1
-                            df["client_id"] = range(start_id, start_id + len(df))
-                        
-                        # Convert DataFrame to SQL
-                        df.to_sql("clients", conn, if_exists="append", index=False)
-                        
-                        st.success(f"Successfully imported {len(df)} client records!")
-                        
-                        # Display current data count
-                        cursor.execute("SELECT COUNT(*) FROM clients")
-                        count = cursor.fetchone()[0]
-                        st.info(f"Total clients in database: {count}")
-            
-            except Exception as e:
-                st.error(f"Error importing data: {str(e)}")
+        import_clients_tab()
     
     with tab2:
-        st.subheader("Import Program Data")
-        
-        # Display expected format
-        with st.expander("Expected Format"):
-            st.write("""
-            Your program data should include the following columns:
-            - program_id (optional, will be auto-generated if not provided)
-            - name (required)
-            - description
-            - category (e.g., Leadership, Technical, Soft Skills)
-            - delivery_mode (In-Person, Virtual, Hybrid)
-            - duration (hours)
-            - base_price
-            - min_participants
-            - max_participants
-            - trainer_cost_per_session
-            - materials_cost_per_participant
-            - active (0 or 1)
-            - creation_date (YYYY-MM-DD)
-            - last_updated (YYYY-MM-DD)
-            """)
-            
-            # Example data
-            st.code("""
-            Example CSV:
-            name,category,delivery_mode,duration,base_price
-            Leadership Essentials,Leadership,In-Person,16,1200
-            Python Programming,Technical,Virtual,24,1500
-            """)
-        
-        # File uploader
-        program_file = st.file_uploader("Upload Program Data", type=["csv", "xlsx", "json"], key="program_upload")
-        
-        if program_file is not None:
-            try:
-                # Determine file type and read accordingly
-                file_extension = program_file.name.split(".")[-1].lower()
-                
-                if file_extension == "csv":
-                    df = pd.read_csv(program_file)
-                elif file_extension == "xlsx":
-                    df = pd.read_excel(program_file)
-                elif file_extension == "json":
-                    df = pd.read_json(program_file)
-                
-                # Display preview
-                st.write("Data Preview:")
-                st.dataframe(df.head())
-                
-                # Validation
-                required_columns = ["name"]
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    st.error(f"Missing required columns: {', '.join(missing_columns)}")
-                else:
-                    # Import button
-                    if st.button("Import Program Data"):
-                        # Prepare data for import
-                        if "program_id" not in df.columns:
-                            # Get the next available ID
-                            cursor.execute("SELECT MAX(program_id) FROM programs")
-                            max_id = cursor.fetchone()[0]
-                            start_id = 1 if max_id is None else max_id + 1
-                            df["program_id"] = range(start_id, start_id + len(df))
-                        
-                        # Convert DataFrame to SQL
-                        df.to_sql("programs", conn, if_exists="append", index=False)
-                        
-                        st.success(f"Successfully imported {len(df)} program records!")
-                        
-                        # Display current data count
-                        cursor.execute("SELECT COUNT(*) FROM programs")
-                        count = cursor.fetchone()[0]
-                        st.info(f"Total programs in database: {count}")
-            
-            except Exception as e:
-                st.error(f"Error importing data: {str(e)}")
+        import_programs_tab()
     
     with tab3:
-        st.subheader("Import Enrollment Data")
-        
-        # Display expected format
-        with st.expander("Expected Format"):
-            st.write("""
-            Your enrollment data should include the following columns:
-            - enrollment_id (optional, will be auto-generated if not provided)
-            - program_id (required, must exist in programs table)
-            - client_id (required, must exist in clients table)
-            - start_date (YYYY-MM-DD)
-            - end_date (YYYY-MM-DD)
-            - location
-            - delivery_mode (In-Person, Virtual, Hybrid)
-            - num_participants
-            - revenue
-            - trainer_cost
-            - logistics_cost
-            - venue_cost
-            - utilities_cost
-            - materials_cost
-            - status (Scheduled, Completed, Cancelled)
-            - feedback_score
-            - notes
-            """)
-            
-            # Example data
-            st.code("""
-            Example CSV:
-            program_id,client_id,start_date,end_date,num_participants,revenue,trainer_cost,status
-            1,1,2024-01-15,2024-01-16,12,14400,2000,Completed
-            2,2,2024-02-10,2024-02-12,8,12000,1800,Completed
-            """)
-        
-        # File uploader
-        enrollment_file = st.file_uploader("Upload Enrollment Data", type=["csv", "xlsx", "json"], key="enrollment_upload")
-        
-        if enrollment_file is not None:
-            try:
-                # Determine file type and read accordingly
-                file_extension = enrollment_file.name.split(".")[-1].lower()
-                
-                if file_extension == "csv":
-                    df = pd.read_csv(enrollment_file)
-                elif file_extension == "xlsx":
-                    df = pd.read_excel(enrollment_file)
-                elif file_extension == "json":
-                    df = pd.read_json(enrollment_file)
-                
-                # Display preview
-                st.write("Data Preview:")
-                st.dataframe(df.head())
-                
-                # Validation
-                required_columns = ["program_id", "client_id"]
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    st.error(f"Missing required columns: {', '.join(missing_columns)}")
-                else:
-                    # Import button
-                    if st.button("Import Enrollment Data"):
-                        # Prepare data for import
-                        if "enrollment_id" not in df.columns:
-                            # Get the next available ID
-                            cursor.execute("SELECT MAX(enrollment_id) FROM enrollments")
-                            max_id = cursor.fetchone()[0]
-                            start_id = 1 if max_id is None else max_id + 1
-                            df["enrollment_id"] = range(start_id, start_id + len(df))
-                        
-                        # Convert DataFrame to SQL
-                        df.to_sql("enrollments", conn, if_exists="append", index=False)
-                        
-                        st.success(f"Successfully imported {len(df)} enrollment records!")
-                        
-                        # Display current data count
-                        cursor.execute("SELECT COUNT(*) FROM enrollments")
-                        count = cursor.fetchone()[0]
-                        st.info(f"Total enrollments in database: {count}")
-            
-            except Exception as e:
-                st.error(f"Error importing data: {str(e)}")
+        import_enrollments_tab()
     
     with tab4:
-        st.subheader("Import Opportunity Data")
-        
-        # Display expected format
-        with st.expander("Expected Format"):
-            st.write("""
-            Your opportunity data should include the following columns:
-            - opportunity_id (optional, will be auto-generated if not provided)
-            - client_id (required, must exist in clients table)
-            - program_id (required, must exist in programs table)
-            - potential_revenue
-            - estimated_participants
-            - stage (Lead, Prospect, Proposal, Negotiation, Closed Won, Closed Lost)
-            - probability (0-100%)
-            - expected_close_date (YYYY-MM-DD)
-            - actual_close_date (YYYY-MM-DD)
-            - created_date (YYYY-MM-DD)
-            - last_updated (YYYY-MM-DD)
-            - owner
-            - notes
-            """)
-            
-            # Example data
-            st.code("""
-            Example CSV:
-            client_id,program_id,potential_revenue,stage,probability,expected_close_date
-            3,1,18000,Proposal,60,2024-05-15
-            4,2,24000,Negotiation,80,2024-04-30
-            """)
-        
-        # File uploader
-        opportunity_file = st.file_uploader("Upload Opportunity Data", type=["csv", "xlsx", "json"], key="opportunity_upload")
-        
-        if opportunity_file is not None:
-            try:
-                # Determine file type and read accordingly
-                file_extension = opportunity_file.name.split(".")[-1].lower()
-                
-                if file_extension == "csv":
-                    df = pd.read_csv(opportunity_file)
-                elif file_extension == "xlsx":
-                    df = pd.read_excel(opportunity_file)
-                elif file_extension == "json":
-                    df = pd.read_json(opportunity_file)
-                
-                # Display preview
-                st.write("Data Preview:")
-                st.dataframe(df.head())
-                
-                # Validation
-                required_columns = ["client_id", "program_id"]
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    st.error(f"Missing required columns: {', '.join(missing_columns)}")
-                else:
-                    # Import button
-                    if st.button("Import Opportunity Data"):
-                        # Prepare data for import
-                        if "opportunity_id" not in df.columns:
-                            # Get the next available ID
-                            cursor.execute("SELECT MAX(opportunity_id) FROM opportunities")
-                            max_id = cursor.fetchone()[0]
-                            start_id = 1 if max_id is None else max_id + 1
-                            df["opportunity_id"] = range(start_id, start_id + len(df))
-                        
-                        # Convert DataFrame to SQL
-                        df.to_sql("opportunities", conn, if_exists="append", index=False)
-                        
-                        st.success(f"Successfully imported {len(df)} opportunity records!")
-                        
-                        # Display current data count
-                        cursor.execute("SELECT COUNT(*) FROM opportunities")
-                        count = cursor.fetchone()[0]
-                        st.info(f"Total opportunities in database: {count}")
-            
-            except Exception as e:
-                st.error(f"Error importing data: {str(e)}")
+        import_opportunities_tab()
     
     # Data export section
     st.header("Export Data")
     st.write("Export your current database tables to CSV files.")
     
+    db_version = get_db_version()
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         if st.button("Export Clients"):
-            clients_df = pd.read_sql("SELECT * FROM clients", conn)
-            csv = clients_df.to_csv(index=False)
+            csv_data = export_table_csv("clients", db_version)
             st.download_button(
                 label="Download Clients CSV",
-                data=csv,
+                data=csv_data,
                 file_name="clients_export.csv",
                 mime="text/csv"
             )
     
     with col2:
         if st.button("Export Programs"):
-            programs_df = pd.read_sql("SELECT * FROM programs", conn)
-            csv = programs_df.to_csv(index=False)
+            csv_data = export_table_csv("programs", db_version)
             st.download_button(
                 label="Download Programs CSV",
-                data=csv,
+                data=csv_data,
                 file_name="programs_export.csv",
                 mime="text/csv"
             )
     
     with col3:
         if st.button("Export Enrollments"):
-            enrollments_df = pd.read_sql("SELECT * FROM enrollments", conn)
-            csv = enrollments_df.to_csv(index=False)
+            csv_data = export_table_csv("enrollments", db_version)
             st.download_button(
                 label="Download Enrollments CSV",
-                data=csv,
+                data=csv_data,
                 file_name="enrollments_export.csv",
                 mime="text/csv"
             )
     
     with col4:
         if st.button("Export Opportunities"):
-            opportunities_df = pd.read_sql("SELECT * FROM opportunities", conn)
-            csv = opportunities_df.to_csv(index=False)
+            csv_data = export_table_csv("opportunities", db_version)
             st.download_button(
                 label="Download Opportunities CSV",
-                data=csv,
+                data=csv_data,
                 file_name="opportunities_export.csv",
                 mime="text/csv"
             )
@@ -442,21 +491,10 @@ if page == "Data Import":
     st.header("Database Statistics")
     col1, col2, col3, col4 = st.columns(4)
     
-    cursor.execute("SELECT COUNT(*) FROM clients")
-    client_count = cursor.fetchone()[0]
-    col1.metric("Clients", client_count)
-    
-    cursor.execute("SELECT COUNT(*) FROM programs")
-    program_count = cursor.fetchone()[0]
-    col2.metric("Programs", program_count)
-    
-    cursor.execute("SELECT COUNT(*) FROM enrollments")
-    enrollment_count = cursor.fetchone()[0]
-    col3.metric("Enrollments", enrollment_count)
-    
-    cursor.execute("SELECT COUNT(*) FROM opportunities")
-    opportunity_count = cursor.fetchone()[0]
-    col4.metric("Opportunities", opportunity_count)
+    col1.metric("Clients", get_table_count("clients", db_version))
+    col2.metric("Programs", get_table_count("programs", db_version))
+    col3.metric("Enrollments", get_table_count("enrollments", db_version))
+    col4.metric("Opportunities", get_table_count("opportunities", db_version))
 
 # Placeholder for other pages
 elif page == "Client Analysis":
@@ -478,6 +516,3 @@ elif page == "Profitability Tracking":
 elif page == "Custom Analysis":
     st.header("Custom Analysis")
     st.info("This section will be implemented in the next phase.")
-
-# Close connection when app is done
-conn.close()
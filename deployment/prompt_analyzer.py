@@ -3,119 +3,342 @@ import numpy as np
 import sqlite3
 import re
 import string
+import functools
+import threading
+import weakref
 from collections import Counter
 import streamlit as st
 
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+
+# Keywords for the different analysis types, shared by every analyzer
+_KEYWORDS = {
+    'entity_types': {
+        'client': ['client', 'clients', 'customer', 'customers', 'organization', 'organizations'],
+        'program': ['program', 'programs', 'course', 'courses', 'training', 'trainings'],
+        'enrollment': ['enrollment', 'enrollments', 'registration', 'registrations'],
+        'opportunity': ['opportunity', 'opportunities', 'pipeline', 'deal', 'deals', 'lead', 'leads']
+    },
+    'metrics': {
+        'revenue': ['revenue', 'sales', 'income', 'earnings', 'money', 'payment', 'payments'],
+        'profit': ['profit', 'profits', 'margin', 'margins', 'profitability', 'earnings'],
+        'cost': ['cost', 'costs', 'expense', 'expenses', 'spending', 'expenditure'],
+        'count': ['count', 'number', 'quantity', 'total', 'amount'],
+        'trend': ['trend', 'trends', 'over time', 'history', 'historical', 'pattern', 'patterns']
+    },
+    'dimensions': {
+        'industry': ['industry', 'industries', 'sector', 'sectors'],
+        'region': ['region', 'regions', 'location', 'locations', 'area', 'areas', 'geography'],
+        'size': ['size', 'sizes', 'company size', 'organization size'],
+        'category': ['category', 'categories', 'type', 'types'],
+        'delivery_mode': ['delivery mode', 'delivery', 'mode', 'online', 'in-person', 'virtual', 'classroom'],
+        'time': ['time', 'month', 'months', 'year', 'years', 'quarter', 'quarters', 'date', 'dates', 'period']
+    },
+    'query_types': {
+        'top': ['top', 'best', 'highest', 'most', 'largest', 'biggest', 'greatest'],
+        'bottom': ['bottom', 'worst', 'lowest', 'least', 'smallest'],
+        'average': ['average', 'avg', 'mean', 'median', 'typical'],
+        'comparison': ['compare', 'comparison', 'versus', 'vs', 'against', 'difference', 'differences'],
+        'distribution': ['distribution', 'breakdown', 'composition', 'makeup', 'split', 'segmentation']
+    },
+    'time_periods': {
+        'this_month': ['this month', 'current month'],
+        'last_month': ['last month', 'previous month'],
+        'this_quarter': ['this quarter', 'current quarter'],
+        'last_quarter': ['last quarter', 'previous quarter'],
+        'this_year': ['this year', 'current year'],
+        'last_year': ['last year', 'previous year']
+    }
+}
+
+# Common analysis templates
+_TEMPLATES = {
+    'top_clients_by_revenue': {
+        'query_type': 'top',
+        'entity_type': 'clients',
+        'metric': 'revenue',
+        'dimension': 'client_name',
+        'title': 'Top Clients by Revenue',
+        'description': 'Shows the clients that have generated the most revenue'
+    },
+    'top_programs_by_revenue': {
+        'query_type': 'top',
+        'entity_type': 'programs',
+        'metric': 'revenue',
+        'dimension': 'program_name',
+        'title': 'Top Programs by Revenue',
+        'description': 'Shows the programs that have generated the most revenue'
+    },
+    'top_programs_by_profit_margin': {
+        'query_type': 'top',
+        'entity_type': 'programs',
+        'metric': 'profit_margin',
+        'dimension': 'program_name',
+        'title': 'Top Programs by Profit Margin',
+        'description': 'Shows the programs with the highest profit margins'
+    },
+    'revenue_by_industry': {
+        'query_type': 'distribution',
+        'entity_type': 'clients',
+        'metric': 'revenue',
+        'dimension': 'industry',
+        'title': 'Revenue Distribution by Industry',
+        'description': 'Shows how revenue is distributed across different client industries'
+    },
+    'revenue_trend_over_time': {
+        'query_type': 'trend',
+        'entity_type': 'enrollments',
+        'metric': 'revenue',
+        'dimension': 'month',
+        'title': 'Revenue Trend Over Time',
+        'description': 'Shows how revenue has changed over time'
+    },
+    'pipeline_by_stage': {
+        'query_type': 'distribution',
+        'entity_type': 'opportunities',
+        'metric': 'pipeline_value',
+        'dimension': 'stage',
+        'title': 'Pipeline Value by Stage',
+        'description': 'Shows the distribution of pipeline value across different stages'
+    },
+    'cost_breakdown': {
+        'query_type': 'distribution',
+        'entity_type': 'enrollments',
+        'metric': 'cost',
+        'dimension': 'cost_type',
+        'title': 'Cost Breakdown',
+        'description': 'Shows the breakdown of costs by category'
+    }
+}
+
+# Translation table mapping every punctuation character to a space
+_PUNCT_TABLE = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+
+# All filters share one alternation; the value sits in a lookahead so a filter
+# mentioned inside another filter's value is still found
+_FILTERS_RE = re.compile(r'(?:(?P<key>industry|region|size|category|stage)\s+(?:is|=|:)'
+                         r'|delivery\s+(?:mode|is|=|:))\s+(?=(?P<value>[a-zA-Z\s]+))',
+                         re.IGNORECASE)
+# The non-ASCII letters re.IGNORECASE matches against ASCII ones, mapped back
+# so a filter name spelt with them ('ſize') is recovered
+_FILTER_KEY_FOLDS = str.maketrans('\u0130\u0131\u017f\u212a', 'iisk')
+# Every filter name except 'stage' is also a dimension keyword, so a prompt
+# without any of these hits cannot contain a filter
+_FILTER_HINTS = frozenset([
+    ('dimensions', 'industry'),
+    ('dimensions', 'region'),
+    ('dimensions', 'size'),
+    ('dimensions', 'category'),
+    ('dimensions', 'delivery_mode')
+])
+_TOP_N_RE = re.compile(r'top\s+(\d+)', re.IGNORECASE)
+_NUM_RE = re.compile(r'\d+')
+
+
+def _build_keyword_index(keywords):
+    """
+    Flatten the keyword buckets into (keyword, (bucket, category)) entries so
+    each distinct keyword is tested once per prompt.
+    
+    A keyword listed under several categories ('earnings' under both revenue
+    and profit) is kept only for the category whose rule analyze_prompt applies
+    last, since that rule overrides the earlier one. Keywords containing a
+    shorter keyword of the same category ('clients' vs 'client') can never add
+    a hit, so they are left out.
+    """
+    owners = {}
+    for bucket, categories in keywords.items():
+        for category, category_keywords in categories.items():
+            for keyword in category_keywords:
+                owners[keyword] = (bucket, category)
+    
+    keyword_index = []
+    for bucket, categories in keywords.items():
+        for category, category_keywords in categories.items():
+            owned = [keyword for keyword in category_keywords if owners[keyword] == (bucket, category)]
+            for keyword in owned:
+                if any(other != keyword and other in keyword for other in owned):
+                    continue
+                keyword_index.append((keyword, (bucket, category)))
+    return keyword_index
+
+
+def _build_keyword_db(keyword_index):
+    """Compile the keyword index into a hyperscan database, or None without hyperscan"""
+    if hyperscan is None:
+        return None
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[re.escape(keyword).encode() for keyword, _ in keyword_index],
+        ids=list(range(len(keyword_index))),
+        elements=len(keyword_index),
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(keyword_index)
+    )
+    return db
+
+
+_KEYWORD_INDEX = _build_keyword_index(_KEYWORDS)
+
+# With the optional hyperscan package, all keywords are matched in one
+# multi-pattern scan; its scratch space is not thread-safe, hence the lock
+_KEYWORD_DB = _build_keyword_db(_KEYWORD_INDEX)
+_KEYWORD_DB_LOCK = threading.Lock()
+
+
+# Title fragments used by generate_title
+_ENTITY_TYPE_TITLES = {
+    'clients': 'Clients',
+    'programs': 'Programs',
+    'enrollments': 'Enrollments',
+    'opportunities': 'Opportunities'
+}
+
+_METRIC_TITLES = {
+    'revenue': 'Revenue',
+    'profit': 'Profit',
+    'profit_margin': 'Profit Margin',
+    'cost': 'Cost',
+    'client_count': 'Client Count',
+    'program_count': 'Program Count',
+    'enrollment_count': 'Enrollment Count',
+    'opportunity_count': 'Opportunity Count',
+    'pipeline_value': 'Pipeline Value',
+    'win_rate': 'Win Rate'
+}
+
+_DIMENSION_TITLES = {
+    'client_name': '',
+    'program_name': '',
+    'industry': 'by Industry',
+    'region': 'by Region',
+    'size': 'by Size',
+    'category': 'by Category',
+    'delivery_mode': 'by Delivery Mode',
+    'month': 'Over Time',
+    'stage': 'by Stage',
+    'cost_type': 'Breakdown'
+}
+
+_QUERY_TYPE_TITLES = {
+    'top': 'Top',
+    'bottom': 'Bottom',
+    'average': 'Average',
+    'comparison': 'Comparison of',
+    'distribution': 'Distribution of',
+    'trend': 'Trend of'
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _build_title(query_type, entity_type, metric, dimension, limit_text):
+    """Build an analysis title; limit_text is None when the params carry no limit"""
+    # Build title
+    title_parts = []
+
+    # Add query type
+    if query_type in _QUERY_TYPE_TITLES:
+        title_parts.append(_QUERY_TYPE_TITLES[query_type])
+
+    # Add limit for top/bottom queries
+    if query_type in ['top', 'bottom'] and limit_text is not None:
+        title_parts.append(limit_text)
+
+    # Add entity type for certain dimensions
+    if dimension in ['client_name', 'program_name']:
+        title_parts.append(_ENTITY_TYPE_TITLES.get(entity_type, entity_type.capitalize()))
+
+    # Add metric
+    if metric in _METRIC_TITLES:
+        title_parts.append(_METRIC_TITLES[metric])
+
+    # Add dimension
+    if dimension in _DIMENSION_TITLES and _DIMENSION_TITLES[dimension]:
+        title_parts.append(_DIMENSION_TITLES[dimension])
+
+    return ' '.join(title_parts)
+
+
+# Prompts offered to the user as starting points
+_SUGGESTED_PROMPTS = (
+    "Show me the top 5 clients by revenue",
+    "What are the most profitable programs?",
+    "Show revenue trend over time",
+    "What is the distribution of revenue by industry?",
+    "Show me the pipeline value by stage",
+    "What is the cost breakdown for all programs?",
+    "Which program categories have the highest profit margins?",
+    "Show me client enrollment trends over the last year",
+    "What is the win rate by program category?",
+    "Compare revenue and profit for different delivery modes"
+)
+
+
 class PromptAnalyzer:
     """
     A class to analyze natural language prompts and generate appropriate analytics.
     Provides a prompt-based interface for custom analysis in the Teaching Organization Analytics application.
     """
     
+    # VisualizationGenerator class, imported by the first execute_analysis call
+    _viz_class = None
+    
     def __init__(self, db_path='data/teaching_analytics.db'):
-        """Initialize the analyzer with database connection"""
+        """Initialize the analyzer; the database connection is opened on first use"""
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
-        
-        # Define keywords for different analysis types
-        self.keywords = {
-            'entity_types': {
-                'client': ['client', 'clients', 'customer', 'customers', 'organization', 'organizations'],
-                'program': ['program', 'programs', 'course', 'courses', 'training', 'trainings'],
-                'enrollment': ['enrollment', 'enrollments', 'registration', 'registrations'],
-                'opportunity': ['opportunity', 'opportunities', 'pipeline', 'deal', 'deals', 'lead', 'leads']
-            },
-            'metrics': {
-                'revenue': ['revenue', 'sales', 'income', 'earnings', 'money', 'payment', 'payments'],
-                'profit': ['profit', 'profits', 'margin', 'margins', 'profitability', 'earnings'],
-                'cost': ['cost', 'costs', 'expense', 'expenses', 'spending', 'expenditure'],
-                'count': ['count', 'number', 'quantity', 'total', 'amount'],
-                'trend': ['trend', 'trends', 'over time', 'history', 'historical', 'pattern', 'patterns']
-            },
-            'dimensions': {
-                'industry': ['industry', 'industries', 'sector', 'sectors'],
-                'region': ['region', 'regions', 'location', 'locations', 'area', 'areas', 'geography'],
-                'size': ['size', 'sizes', 'company size', 'organization size'],
-                'category': ['category', 'categories', 'type', 'types'],
-                'delivery_mode': ['delivery mode', 'delivery', 'mode', 'online', 'in-person', 'virtual', 'classroom'],
-                'time': ['time', 'month', 'months', 'year', 'years', 'quarter', 'quarters', 'date', 'dates', 'period']
-            },
-            'query_types': {
-                'top': ['top', 'best', 'highest', 'most', 'largest', 'biggest', 'greatest'],
-                'bottom': ['bottom', 'worst', 'lowest', 'least', 'smallest'],
-                'average': ['average', 'avg', 'mean', 'median', 'typical'],
-                'comparison': ['compare', 'comparison', 'versus', 'vs', 'against', 'difference', 'differences'],
-                'distribution': ['distribution', 'breakdown', 'composition', 'makeup', 'split', 'segmentation']
-            },
-            'time_periods': {
-                'this_month': ['this month', 'current month'],
-                'last_month': ['last month', 'previous month'],
-                'this_quarter': ['this quarter', 'current quarter'],
-                'last_quarter': ['last quarter', 'previous quarter'],
-                'this_year': ['this year', 'current year'],
-                'last_year': ['last year', 'previous year']
-            }
-        }
+        self._conn = None
+        self._viz_local = threading.local()
+        # Every thread's generator, so close() can reach all of them
+        self._viz_gens = weakref.WeakSet()
+        self._viz_lock = threading.Lock()
+        
+        self.keywords = _KEYWORDS
+        self.templates = _TEMPLATES
+        
+        # Prompt parsing is a pure function of the prompt text, so memoize it
+        # per analyzer; suggested prompts are re-submitted on every rerun
+        self._parse_prompt_cached = functools.lru_cache(maxsize=512)(self._parse_prompt)
+        self._match_template_key_cached = functools.lru_cache(maxsize=512)(self._match_template_key)
+    
+    @property
+    def conn(self):
+        """
+        Read-only database connection, opened on first access
         
-        # Define common analysis templates
-        self.templates = {
-            'top_clients_by_revenue': {
-                'query_type': 'top',
-                'entity_type': 'clients',
-                'metric': 'revenue',
-                'dimension': 'client_name',
-                'title': 'Top Clients by Revenue',
-                'description': 'Shows the clients that have generated the most revenue'
-            },
-            'top_programs_by_revenue': {
-                'query_type': 'top',
-                'entity_type': 'programs',
-                'metric': 'revenue',
-                'dimension': 'program_name',
-                'title': 'Top Programs by Revenue',
-                'description': 'Shows the programs that have generated the most revenue'
-            },
-            'top_programs_by_profit_margin': {
-                'query_type': 'top',
-                'entity_type': 'programs',
-                'metric': 'profit_margin',
-                'dimension': 'program_name',
-                'title': 'Top Programs by Profit Margin',
-                'description': 'Shows the programs with the highest profit margins'
-            },
-            'revenue_by_industry': {
-                'query_type': 'distribution',
-                'entity_type': 'clients',
-                'metric': 'revenue',
-                'dimension': 'industry',
-                'title': 'Revenue Distribution by Industry',
-                'description': 'Shows how revenue is distributed across different client industries'
-            },
-            'revenue_trend_over_time': {
-                'query_type': 'trend',
-                'entity_type': 'enrollments',
-                'metric': 'revenue',
-                'dimension': 'month',
-                'title': 'Revenue Trend Over Time',
-                'description': 'Shows how revenue has changed over time'
-            },
-            'pipeline_by_stage': {
-                'query_type': 'distribution',
-                'entity_type': 'opportunities',
-                'metric': 'pipeline_value',
-                'dimension': 'stage',
-                'title': 'Pipeline Value by Stage',
-                'description': 'Shows the distribution of pipeline value across different stages'
-            },
-            'cost_breakdown': {
-                'query_type': 'distribution',
-                'entity_type': 'enrollments',
-                'metric': 'cost',
-                'dimension': 'cost_type',
-                'title': 'Cost Breakdown',
-                'description': 'Shows the breakdown of costs by category'
-            }
-        }
+        Returns:
+            sqlite3.Connection: Connection to the analytics database
+        """
+        if self._conn is None:
+            self._conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False)
+            self._conn.execute('PRAGMA query_only = 1')
+            self._conn.execute('PRAGMA mmap_size = 268435456')
+        return self._conn
+    
+    @property
+    def viz_gen(self):
+        """
+        Visualization generator used to run analyses, created on first use
+        
+        Each thread gets its own generator, so concurrent Streamlit script threads
+        never share one SQLite connection; close() closes all of them.
+        
+        Returns:
+            VisualizationGenerator: Generator for this analyzer and thread
+        """
+        viz_gen = getattr(self._viz_local, 'viz_gen', None)
+        if viz_gen is None:
+            # Import visualization generator once; it stays deferred because it pulls in plotly
+            viz_class = PromptAnalyzer._viz_class
+            if viz_class is None:
+                from visualization_generator import VisualizationGenerator as viz_class
+                PromptAnalyzer._viz_class = viz_class
+            viz_gen = self._viz_local.viz_gen = viz_class(self.db_path)
+            with self._viz_lock:
+                self._viz_gens.add(viz_gen)
+        return viz_gen
     
     def simple_tokenize(self, text):
         """
@@ -127,15 +350,8 @@ class PromptAnalyzer:
         Returns:
             list: Tokenized words
         """
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Replace punctuation with spaces
-        for punct in string.punctuation:
-            text = text.replace(punct, ' ')
-        
-        # Split on whitespace and filter out empty strings
-        return [word for word in text.split() if word]
+        # Lowercase, map punctuation to spaces in one pass and split on whitespace
+        return text.lower().translate(_PUNCT_TABLE).split()
     
     def extract_number(self, text):
         """
@@ -148,21 +364,89 @@ class PromptAnalyzer:
             int: Extracted number or None
         """
         # Look for patterns like "top 5", "top 10", etc.
-        match = re.search(r'top\s+(\d+)', text.lower())
+        match = _TOP_N_RE.search(text)
         if match:
             return int(match.group(1))
         
         # Look for other number patterns
-        numbers = re.findall(r'\d+', text)
-        if numbers:
-            return int(numbers[0])
+        match = _NUM_RE.search(text)
+        if match:
+            return int(match.group())
         
         return None
     
+    def find_keyword_hits(self, prompt_lower):
+        """
+        Find the keyword categories mentioned in a prompt in a single scan
+        
+        Args:
+            prompt_lower: Lowercased natural language prompt
+        
+        Returns:
+            set: (bucket, category) pairs with at least one keyword in the prompt
+        """
+        hits = set()
+        
+        if _KEYWORD_DB is not None:
+            def on_match(keyword_id, start, end, flags, context):
+                hits.add(_KEYWORD_INDEX[keyword_id][1])
+            
+            with _KEYWORD_DB_LOCK:
+                _KEYWORD_DB.scan(prompt_lower.encode('utf-8'), match_event_handler=on_match)
+            return hits
+        
+        for keyword, pair in _KEYWORD_INDEX:
+            if keyword in prompt_lower:
+                hits.add(pair)
+        return hits
+    
     def analyze_prompt(self, prompt):
         """
         Analyze a natural language prompt to determine the analysis parameters
         
+        Args:
+            prompt: Natural language prompt from user
+            
+        Returns:
+            dict: Analysis parameters
+        """
+        params = self._parse_prompt_cached(prompt)
+        
+        # Hand out a copy so callers can't modify the cached result
+        return dict(params, filters=dict(params['filters']))
+    
+    def analyze_prompts_batch(self, prompts):
+        """
+        Analyze many prompts at once, e.g. a log of saved prompts
+        
+        Each distinct prompt is parsed once through the same memoized path as
+        analyze_prompt, and the results are laid out column by column.
+        
+        Args:
+            prompts: Iterable of natural language prompts
+        
+        Returns:
+            DataFrame: One row per prompt with the prompt and its analysis parameters
+        """
+        prompts = pd.Series(list(prompts), dtype=object)
+        codes, uniques = pd.factorize(prompts, use_na_sentinel=False)
+        
+        parsed = pd.DataFrame.from_records(
+            [self._parse_prompt_cached(prompt) for prompt in uniques],
+            columns=['query_type', 'entity_type', 'metric', 'dimension', 'limit', 'filters']
+        )
+        result = parsed.take(codes).reset_index(drop=True)
+        
+        # Give every row its own filters dict so the cached results stay untouched
+        result['filters'] = [dict(filters) for filters in result['filters']]
+        result.insert(0, 'prompt', prompts)
+        
+        return result
+    
+    def _parse_prompt(self, prompt):
+        """
+        Uncached implementation of analyze_prompt
+        
         Args:
             prompt: Natural language prompt from user
             
@@ -179,146 +463,122 @@ class PromptAnalyzer:
             'filters': {}
         }
         
-        # Tokenize the prompt
-        tokens = self.simple_tokenize(prompt)
+        # Lowercase once and reuse it for every keyword check
+        prompt_lower = prompt.lower()
         
         # Extract limit if present
-        limit = self.extract_number(prompt)
+        limit = self.extract_number(prompt_lower)
         if limit:
             params['limit'] = limit
         
+        # Find all keyword categories mentioned in the prompt
+        hits = self.find_keyword_hits(prompt_lower)
+        
         # Check for entity types
-        for entity_type, keywords in self.keywords['entity_types'].items():
-            for keyword in keywords:
-                if keyword in prompt.lower():
-                    if entity_type == 'client':
-                        params['entity_type'] = 'clients'
-                        params['dimension'] = 'client_name'
-                    elif entity_type == 'program':
-                        params['entity_type'] = 'programs'
-                        params['dimension'] = 'program_name'
-                    elif entity_type == 'enrollment':
-                        params['entity_type'] = 'enrollments'
-                    elif entity_type == 'opportunity':
-                        params['entity_type'] = 'opportunities'
-                    break
+        for entity_type in _KEYWORDS['entity_types']:
+            if ('entity_types', entity_type) in hits:
+                if entity_type == 'client':
+                    params['entity_type'] = 'clients'
+                    params['dimension'] = 'client_name'
+                elif entity_type == 'program':
+                    params['entity_type'] = 'programs'
+                    params['dimension'] = 'program_name'
+                elif entity_type == 'enrollment':
+                    params['entity_type'] = 'enrollments'
+                elif entity_type == 'opportunity':
+                    params['entity_type'] = 'opportunities'
         
         # Check for metrics
-        for metric, keywords in self.keywords['metrics'].items():
-            for keyword in keywords:
-                if keyword in prompt.lower():
-                    if metric == 'revenue':
-                        params['metric'] = 'revenue'
-                    elif metric == 'profit':
-                        if 'margin' in prompt.lower():
-                            params['metric'] = 'profit_margin'
-                        else:
-                            params['metric'] = 'profit'
-                    elif metric == 'cost':
-                        params['metric'] = 'cost'
-                    elif metric == 'count':
-                        if params['entity_type'] == 'clients':
-                            params['metric'] = 'client_count'
-                        elif params['entity_type'] == 'programs':
-                            params['metric'] = 'program_count'
-                        elif params['entity_type'] == 'enrollments':
-                            params['metric'] = 'enrollment_count'
-                        elif params['entity_type'] == 'opportunities':
-                            params['metric'] = 'opportunity_count'
-                    elif metric == 'trend':
-                        params['query_type'] = 'trend'
-                        params['dimension'] = 'month'
-                    break
+        for metric in _KEYWORDS['metrics']:
+            if ('metrics', metric) in hits:
+                if metric == 'revenue':
+                    params['metric'] = 'revenue'
+                elif metric == 'profit':
+                    if 'margin' in prompt_lower:
+                        params['metric'] = 'profit_margin'
+                    else:
+                        params['metric'] = 'profit'
+                elif metric == 'cost':
+                    params['metric'] = 'cost'
+                elif metric == 'count':
+                    if params['entity_type'] == 'clients':
+                        params['metric'] = 'client_count'
+                    elif params['entity_type'] == 'programs':
+                        params['metric'] = 'program_count'
+                    elif params['entity_type'] == 'enrollments':
+                        params['metric'] = 'enrollment_count'
+                    elif params['entity_type'] == 'opportunities':
+                        params['metric'] = 'opportunity_count'
+                elif metric == 'trend':
+                    params['query_type'] = 'trend'
+                    params['dimension'] = 'month'
         
         # Check for dimensions
-        for dimension, keywords in self.keywords['dimensions'].items():
-            for keyword in keywords:
-                if keyword in prompt.lower():
-                    if dimension == 'industry':
-                        params['dimension'] = 'industry'
-                    elif dimension == 'region':
-                        params['dimension'] = 'region'
-                    elif dimension == 'size':
-                        params['dimension'] = 'size'
-                    elif dimension == 'category':
-                        params['dimension'] = 'category'
-                    elif dimension == 'delivery_mode':
-                        params['dimension'] = 'delivery_mode'
-                    elif dimension == 'time':
-                        params['dimension'] = 'month'
-                        params['query_type'] = 'trend'
-                    break
+        for dimension in _KEYWORDS['dimensions']:
+            if ('dimensions', dimension) in hits:
+                if dimension == 'industry':
+                    params['dimension'] = 'industry'
+                elif dimension == 'region':
+                    params['dimension'] = 'region'
+                elif dimension == 'size':
+                    params['dimension'] = 'size'
+                elif dimension == 'category':
+                    params['dimension'] = 'category'
+                elif dimension == 'delivery_mode':
+                    params['dimension'] = 'delivery_mode'
+                elif dimension == 'time':
+                    params['dimension'] = 'month'
+                    params['query_type'] = 'trend'
         
         # Check for query types
-        for query_type, keywords in self.keywords['query_types'].items():
-            for keyword in keywords:
-                if keyword in prompt.lower():
-                    if query_type == 'top':
-                        params['query_type'] = 'top'
-                    elif query_type == 'bottom':
-                        params['query_type'] = 'bottom'
-                    elif query_type == 'average':
-                        params['query_type'] = 'average'
-                    elif query_type == 'comparison':
-                        params['query_type'] = 'comparison'
-                    elif query_type == 'distribution':
-                        params['query_type'] = 'distribution'
-                    break
+        for query_type in _KEYWORDS['query_types']:
+            if ('query_types', query_type) in hits:
+                if query_type == 'top':
+                    params['query_type'] = 'top'
+                elif query_type == 'bottom':
+                    params['query_type'] = 'bottom'
+                elif query_type == 'average':
+                    params['query_type'] = 'average'
+                elif query_type == 'comparison':
+                    params['query_type'] = 'comparison'
+                elif query_type == 'distribution':
+                    params['query_type'] = 'distribution'
         
         # Check for time periods
-        for period, keywords in self.keywords['time_periods'].items():
-            for keyword in keywords:
-                if keyword in prompt.lower():
-                    if period == 'this_month':
-                        params['filters']['date_from'] = 'date("now", "start of month")'
-                        params['filters']['date_to'] = 'date("now")'
-                    elif period == 'last_month':
-                        params['filters']['date_from'] = 'date("now", "start of month", "-1 month")'
-                        params['filters']['date_to'] = 'date("now", "start of month", "-1 day")'
-                    elif period == 'this_quarter':
-                        params['filters']['date_from'] = 'date("now", "start of month", "-" || (strftime("%m", "now") - 1) % 3 || " months")'
-                        params['filters']['date_to'] = 'date("now")'
-                    elif period == 'last_quarter':
-                        params['filters']['date_from'] = 'date("now", "start of month", "-" || (strftime("%m", "now") - 1) % 3 + 3 || " months")'
-                        params['filters']['date_to'] = 'date("now", "start of month", "-" || (strftime("%m", "now") - 1) % 3 || " months", "-1 day")'
-                    elif period == 'this_year':
-                        params['filters']['date_from'] = 'date("now", "start of year")'
-                        params['filters']['date_to'] = 'date("now")'
-                    elif period == 'last_year':
-                        params['filters']['date_from'] = 'date("now", "start of year", "-1 year")'
-                        params['filters']['date_to'] = 'date("now", "start of year", "-1 day")'
-                    break
-        
-        # Check for specific filters
-        # Industry filter
-        industry_match = re.search(r'industry\s+(?:is|=|:)\s+([a-zA-Z\s]+)', prompt, re.IGNORECASE)
-        if industry_match:
-            params['filters']['industry'] = industry_match.group(1).strip()
-        
-        # Region filter
-        region_match = re.search(r'region\s+(?:is|=|:)\s+([a-zA-Z\s]+)', prompt, re.IGNORECASE)
-        if region_match:
-            params['filters']['region'] = region_match.group(1).strip()
-        
-        # Size filter
-        size_match = re.search(r'size\s+(?:is|=|:)\s+([a-zA-Z\s]+)', prompt, re.IGNORECASE)
-        if size_match:
-            params['filters']['size'] = size_match.group(1).strip()
-        
-        # Category filter
-        category_match = re.search(r'category\s+(?:is|=|:)\s+([a-zA-Z\s]+)', prompt, re.IGNORECASE)
-        if category_match:
-            params['filters']['category'] = category_match.group(1).strip()
-        
-        # Delivery mode filter
-        delivery_match = re.search(r'delivery\s+(?:mode|is|=|:)\s+([a-zA-Z\s]+)', prompt, re.IGNORECASE)
-        if delivery_match:
-            params['filters']['delivery_mode'] = delivery_match.group(1).strip()
-        
-        # Stage filter
-        stage_match = re.search(r'stage\s+(?:is|=|:)\s+([a-zA-Z\s]+)', prompt, re.IGNORECASE)
-        if stage_match:
-            params['filters']['stage'] = stage_match.group(1).strip()
+        for period in _KEYWORDS['time_periods']:
+            if ('time_periods', period) in hits:
+                if period == 'this_month':
+                    params['filters']['date_from'] = 'date("now", "start of month")'
+                    params['filters']['date_to'] = 'date("now")'
+                elif period == 'last_month':
+                    params['filters']['date_from'] = 'date("now", "start of month", "-1 month")'
+                    params['filters']['date_to'] = 'date("now", "start of month", "-1 day")'
+                elif period == 'this_quarter':
+                    params['filters']['date_from'] = 'date("now", "start of month", "-" || (strftime("%m", "now") - 1) % 3 || " months")'
+                    params['filters']['date_to'] = 'date("now")'
+                elif period == 'last_quarter':
+                    params['filters']['date_from'] = 'date("now", "start of month", "-" || (strftime("%m", "now") - 1) % 3 + 3 || " months")'
+                    params['filters']['date_to'] = 'date("now", "start of month", "-" || (strftime("%m", "now") - 1) % 3 || " months", "-1 day")'
+                elif period == 'this_year':
+                    params['filters']['date_from'] = 'date("now", "start of year")'
+                    params['filters']['date_to'] = 'date("now")'
+                elif period == 'last_year':
+                    params['filters']['date_from'] = 'date("now", "start of year", "-1 year")'
+                    params['filters']['date_to'] = 'date("now", "start of year", "-1 day")'
+        
+        # Check for specific filters (industry, region, size, category, delivery mode, stage)
+        # in one case-insensitive pass over the prompt, keeping the first mention of each.
+        # The keyword hits only see ASCII spellings of the filter names, so the regex is
+        # skipped only for ASCII prompts without any of them
+        if not prompt.isascii() or not hits.isdisjoint(_FILTER_HINTS) or 'stage' in prompt_lower:
+            matches = _FILTERS_RE.finditer(prompt)
+        else:
+            matches = ()
+        for match in matches:
+            key = match.group('key')
+            key = key.translate(_FILTER_KEY_FOLDS).lower() if key else 'delivery_mode'
+            if key not in params['filters']:
+                params['filters'][key] = prompt[match.start('value'):match.end('value')].strip()
         
         return params
     
@@ -332,29 +592,42 @@ class PromptAnalyzer:
         Returns:
             dict: Template parameters or None if no match
         """
+        key = self._match_template_key_cached(prompt)
+        return _TEMPLATES[key] if key else None
+    
+    def _match_template_key(self, prompt):
+        """
+        Find the key of the predefined template a prompt matches
+        
+        Args:
+            prompt: Natural language prompt from user
+            
+        Returns:
+            str: Template key or None if no match
+        """
         # Check for exact matches first
         prompt_lower = prompt.lower()
         
         if 'top client' in prompt_lower and 'revenue' in prompt_lower:
-            return self.templates['top_clients_by_revenue']
+            return 'top_clients_by_revenue'
         
         if 'top program' in prompt_lower and 'revenue' in prompt_lower:
-            return self.templates['top_programs_by_revenue']
+            return 'top_programs_by_revenue'
         
         if ('top program' in prompt_lower or 'best program' in prompt_lower) and ('profit margin' in prompt_lower or 'profitability' in prompt_lower):
-            return self.templates['top_programs_by_profit_margin']
+            return 'top_programs_by_profit_margin'
         
         if 'revenue' in prompt_lower and 'industry' in prompt_lower:
-            return self.templates['revenue_by_industry']
+            return 'revenue_by_industry'
         
         if ('revenue' in prompt_lower or 'sales' in prompt_lower) and ('trend' in prompt_lower or 'over time' in prompt_lower):
-            return self.templates['revenue_trend_over_time']
+            return 'revenue_trend_over_time'
         
         if ('pipeline' in prompt_lower or 'opportunity' in prompt_lower) and 'stage' in prompt_lower:
-            return self.templates['pipeline_by_stage']
+            return 'pipeline_by_stage'
         
         if 'cost' in prompt_lower and ('breakdown' in prompt_lower or 'distribution' in prompt_lower):
-            return self.templates['cost_breakdown']
+            return 'cost_breakdown'
         
         # If no exact match, use the analyze_prompt function
         return None
@@ -369,72 +642,14 @@ class PromptAnalyzer:
         Returns:
             str: Generated title
         """
-        entity_type_map = {
-            'clients': 'Clients',
-            'programs': 'Programs',
-            'enrollments': 'Enrollments',
-            'opportunities': 'Opportunities'
-        }
-        
-        metric_map = {
-            'revenue': 'Revenue',
-            'profit': 'Profit',
-            'profit_margin': 'Profit Margin',
-            'cost': 'Cost',
-            'client_count': 'Client Count',
-            'program_count': 'Program Count',
-            'enrollment_count': 'Enrollment Count',
-            'opportunity_count': 'Opportunity Count',
-            'pipeline_value': 'Pipeline Value',
-            'win_rate': 'Win Rate'
-        }
-        
-        dimension_map = {
-            'client_name': '',
-            'program_name': '',
-            'industry': 'by Industry',
-            'region': 'by Region',
-            'size': 'by Size',
-            'category': 'by Category',
-            'delivery_mode': 'by Delivery Mode',
-            'month': 'Over Time',
-            'stage': 'by Stage',
-            'cost_type': 'Breakdown'
-        }
-        
-        query_type_map = {
-            'top': 'Top',
-            'bottom': 'Bottom',
-            'average': 'Average',
-            'comparison': 'Comparison of',
-            'distribution': 'Distribution of',
-            'trend': 'Trend of'
-        }
-        
-        # Build title
-        title_parts = []
-        
-        # Add query type
-        if params['query_type'] in query_type_map:
-            title_parts.append(query_type_map[params['query_type']])
-        
-        # Add limit for top/bottom queries
-        if params['query_type'] in ['top', 'bottom'] and 'limit' in params:
-            title_parts.append(str(params['limit']))
-        
-        # Add entity type for certain dimensions
-        if params['dimension'] in ['client_name', 'program_name']:
-            title_parts.append(entity_type_map.get(params['entity_type'], params['entity_type'].capitalize()))
-        
-        # Add metric
-        if params['metric'] in metric_map:
-            title_parts.append(metric_map[params['metric']])
-        
-        # Add dimension
-        if params['dimension'] in dimension_map and dimension_map[params['dimension']]:
-            title_parts.append(dimension_map[params['dimension']])
-        
-        return ' '.join(title_parts)
+        # The parameter space is small, so titles are built once per combination
+        return _build_title(
+            params['query_type'],
+            params['entity_type'],
+            params['metric'],
+            params['dimension'],
+            str(params['limit']) if 'limit' in params else None
+        )
     
     def execute_analysis(self, params):
         """
@@ -447,14 +662,8 @@ class PromptAnalyzer:
             dict: Analysis results
         """
         try:
-            # Import visualization generator
-            from visualization_generator import VisualizationGenerator
-            
-            # Create visualization generator
-            viz_gen = VisualizationGenerator(self.db_path)
-            
             # Generate custom visualization
-            result = viz_gen.create_custom_visualization(
+            result = self.viz_gen.create_custom_visualization(
                 query_type=params['query_type'],
                 entity_type=params['entity_type'],
                 metric=params['metric'],
@@ -509,28 +718,27 @@ class PromptAnalyzer:
     
     def get_suggested_prompts(self):
         """
-        Get a list of suggested prompts for the user
+        Get the suggested prompts for the user
         
         Returns:
-            list: Suggested prompts
+            tuple: Suggested prompts (shared; use list() for a mutable copy)
         """
-        return [
-            "Show me the top 5 clients by revenue",
-            "What are the most profitable programs?",
-            "Show revenue trend over time",
-            "What is the distribution of revenue by industry?",
-            "Show me the pipeline value by stage",
-            "What is the cost breakdown for all programs?",
-            "Which program categories have the highest profit margins?",
-            "Show me client enrollment trends over the last year",
-            "What is the win rate by program category?",
-            "Compare revenue and profit for different delivery modes"
-        ]
+        return _SUGGESTED_PROMPTS
     
     def close(self):
-        """Close the database connection"""
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
+        """Close the database connections of every thread and drop the memoized prompt results"""
+        self._parse_prompt_cached.cache_clear()
+        self._match_template_key_cached.cache_clear()
+        with self._viz_lock:
+            viz_gens = list(self._viz_gens)
+            self._viz_gens.clear()
+        for viz_gen in viz_gens:
+            viz_gen.close()
+        # Threads that use the analyzer again get a fresh generator
+        self._viz_local = threading.local()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
 
 # Example usage:
@@ -2,7 +2,7 @@
 
 -- Clients Table
 CREATE TABLE clients (
-    client_id INTEGER PRIMARY KEY,
+    client_id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
     industry TEXT,
     size TEXT,  -- Small, Medium, Large, Enterprise
@@ -18,7 +18,7 @@ CREATE TABLE clients (
 
 -- Programs Table
 CREATE TABLE programs (
-    program_id INTEGER PRIMARY KEY,
+    program_id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
     description TEXT,
     category TEXT,  -- e.g., Leadership, Technical, Soft Skills
@@ -36,7 +36,7 @@ CREATE TABLE programs (
 
 -- Enrollments Table (tracks program runs and participants)
 CREATE TABLE enrollments (
-    enrollment_id INTEGER PRIMARY KEY,
+    enrollment_id INTEGER PRIMARY KEY AUTOINCREMENT,
     program_id INTEGER,
     client_id INTEGER,
     start_date TEXT,
@@ -59,7 +59,7 @@ CREATE TABLE enrollments (
 
 -- Opportunities Table (sales pipeline)
 CREATE TABLE opportunities (
-    opportunity_id INTEGER PRIMARY KEY,
+    opportunity_id INTEGER PRIMARY KEY AUTOINCREMENT,
     client_id INTEGER,
     program_id INTEGER,
     potential_revenue REAL,
@@ -76,6 +76,20 @@ CREATE TABLE opportunities (
     FOREIGN KEY (program_id) REFERENCES programs (program_id)
 );
 
+-- Stage Order Table (sort position of each pipeline stage)
+CREATE TABLE stage_order (
+    stage TEXT PRIMARY KEY,
+    ord INTEGER
+);
+
+INSERT INTO stage_order (stage, ord) VALUES
+    ('Lead', 1),
+    ('Prospect', 2),
+    ('Proposal', 3),
+    ('Negotiation', 4),
+    ('Closed Won', 5),
+    ('Closed Lost', 6);
+
 -- Views for Analysis
 
 -- Profitability View
@@ -1,11 +1,147 @@
 import pandas as pd
 import numpy as np
 import sqlite3
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import streamlit as st
-from datetime import datetime, timedelta
+import functools
+import hashlib
+import os
+from datetime import datetime
+
+# Display/sort position of each pipeline stage
+_STAGE_RANK = {'Lead': 1, 'Prospect': 2, 'Proposal': 3, 'Negotiation': 4, 'Closed Won': 5, 'Closed Lost': 6}
+
+
+# Bar color of each pipeline stage (Plotly's default qualitative palette, in stage order)
+_STAGE_COLORS = {
+    'Lead': '#636EFA',
+    'Prospect': '#EF553B',
+    'Proposal': '#00CC96',
+    'Negotiation': '#AB63FA',
+    'Closed Won': '#FFA15A',
+    'Closed Lost': '#19D3F3'
+}
+_OTHER_STAGE_COLOR = '#7F7F7F'
+
+
+def _sort_by_stage(df, column='stage'):
+    """Order rows by pipeline stage, keeping stages outside the pipeline last"""
+    return df.sort_values(column, key=lambda stages: stages.map(_STAGE_RANK).fillna(len(_STAGE_RANK) + 1), kind='stable')
+
+
+@st.cache_resource
+def _get_conn(db_path):
+    """
+    Open one connection per database for the whole process so Streamlit reruns
+    reuse its page cache and prepared statement cache instead of reconnecting.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, cached_statements=256)
+    
+    # Let SQLite memory-map the file and keep temp b-trees/sorts in memory
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-65536;
+    """)
+    return conn
+
+
+def _db_mtime(db_path):
+    """Last modification time of the database, including writes still held in its WAL file"""
+    wal_path = db_path + '-wal'
+    mtime = os.path.getmtime(db_path)
+    if os.path.exists(wal_path):
+        mtime = max(mtime, os.path.getmtime(wal_path))
+    return mtime
+
+
+def _cached_analysis(method=None, report_errors=True):
+    """
+    Memoize an analysis method across Streamlit reruns with st.cache_data.
+    Results are keyed on the database path, its modification time and the call
+    arguments, so any write to the database invalidates them.
+    
+    SQLite errors (missing tables, a locked database) are raised through the
+    cache so failures are never memoized, then reported as {'error': ...} unless
+    report_errors is False.
+    """
+    if method is None:
+        return functools.partial(_cached_analysis, report_errors=report_errors)
+    
+    def cached(_self, db_path, db_mtime, *args, **kwargs):
+        return method(_self, *args, **kwargs)
+    
+    # st.cache_data keys its cache on the function's qualified name, so give each
+    # wrapped method its own instead of sharing "_cached_analysis.<locals>.cached"
+    cached.__qualname__ = method.__qualname__
+    cached = st.cache_data(ttl=3600, show_spinner=False)(cached)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not report_errors:
+            return cached(self, self.db_path, _db_mtime(self.db_path), *args, **kwargs)
+        
+        try:
+            return cached(self, self.db_path, _db_mtime(self.db_path), *args, **kwargs)
+        except sqlite3.OperationalError as e:
+            return {'error': str(e)}
+    
+    return wrapper
+
+
+def _data_digest(data):
+    """Content hash of an analysis result dictionary, used to key cached charts"""
+    digest = hashlib.sha1()
+    for key in sorted(data):
+        value = data[key]
+        digest.update(key.encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        else:
+            digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+class _UncachedChart(Exception):
+    """Carries a chart result that must not be memoized out of the cached function"""
+
+
+def _cached_chart(method):
+    """
+    Memoize a chart builder across Streamlit reruns with st.cache_data.
+    Charts are keyed on a content hash of the data passed in, or on the database
+    version when the builder loads its own data, and are cached as plain figure
+    dictionaries so every caller gets an independent Figure. Missing charts (None)
+    and Figure subclasses that a dictionary cannot rebuild are returned uncached.
+    """
+    def cached(_self, data_key, _data, *args, **kwargs):
+        import plotly.graph_objects as go
+        
+        fig = method(_self, _data, *args, **kwargs)
+        if type(fig) is not go.Figure:
+            raise _UncachedChart(fig)
+        return fig.to_dict()
+    
+    cached.__qualname__ = method.__qualname__
+    cached = st.cache_data(ttl=3600, show_spinner=False, max_entries=32)(cached)
+    
+    @functools.wraps(method)
+    def wrapper(self, data=None, *args, **kwargs):
+        import plotly.graph_objects as go
+        
+        if data is None:
+            data_key = (self.db_path, _db_mtime(self.db_path))
+        else:
+            data_key = _data_digest(data)
+        
+        try:
+            fig_dict = cached(self, data_key, data, *args, **kwargs)
+        except _UncachedChart as uncached:
+            return uncached.args[0]
+        return go.Figure(fig_dict)
+    
+    return wrapper
 
 class OpportunityAnalyzer:
     """
@@ -16,8 +152,64 @@ class OpportunityAnalyzer:
     def __init__(self, db_path='data/teaching_analytics.db'):
         """Initialize the analyzer with database connection"""
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.conn = _get_conn(db_path)
+        
+        # Stage sort lookup joined by the stage-ordered queries, plus indexes for the
+        # stage filters, joins and date grouping used by the analyses
+        try:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS stage_order (stage TEXT PRIMARY KEY, ord INTEGER)")
+            self.conn.executemany("INSERT OR IGNORE INTO stage_order (stage, ord) VALUES (?, ?)", _STAGE_RANK.items())
+            self.conn.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_opp_stage_close ON opportunities(stage, expected_close_date, actual_close_date, created_date, potential_revenue, probability);
+                CREATE INDEX IF NOT EXISTS idx_opp_client ON opportunities(client_id, stage);
+                CREATE INDEX IF NOT EXISTS idx_opp_program ON opportunities(program_id, stage);
+                CREATE INDEX IF NOT EXISTS idx_opp_open_revenue ON opportunities(potential_revenue DESC) WHERE stage NOT IN ('Closed Won', 'Closed Lost');
+            """)
+        except sqlite3.OperationalError:
+            # Schema not created yet; the analysis methods report the missing table
+            pass
+    
+    def _query(self, query, params=(), dtype=None):
+        """Run a query on the shared connection and build the DataFrame straight from the cursor
+        
+        Args:
+            query: SQL query
+            params: Query parameters
+            dtype: Optional column dtypes, applied so empty results keep the same schema
+            
+        Returns:
+            pandas.DataFrame: Query results
+        """
+        cursor = self.conn.execute(query, params)
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+        return df.astype(dtype) if dtype else df
+    
+    @_cached_analysis(report_errors=False)
+    def _stage_summary(self):
+        """
+        Aggregate opportunities per stage in one scan, shared by the overview and
+        conversion analyses
+        
+        Returns:
+            pandas.DataFrame: Count, potential revenue and weighted value per stage, in stage order
+        """
+        query = """
+        SELECT s.stage, s.count, s.potential_revenue, s.weighted_value
+        FROM (
+            SELECT 
+                stage,
+                COUNT(*) as count,
+                SUM(potential_revenue) as potential_revenue,
+                SUM(potential_revenue * (probability / 100)) as weighted_value
+            FROM opportunities 
+            GROUP BY stage
+        ) s
+        LEFT JOIN stage_order so ON so.stage = s.stage
+        ORDER BY COALESCE(so.ord, 7)
+        """
+        return self._query(query, dtype={'count': 'int64', 'potential_revenue': 'float64', 'weighted_value': 'float64'})
     
+    @_cached_analysis
     def get_pipeline_overview(self):
         """
         Get an overview of the sales pipeline
@@ -25,98 +217,86 @@ class OpportunityAnalyzer:
         Returns:
             dict: Overview statistics
         """
-        try:
-            # Get total opportunities
-            query = "SELECT COUNT(*) FROM opportunities"
-            total_opportunities = pd.read_sql(query, self.conn).iloc[0, 0]
-            
-            # Get stage distribution
-            query = """
-            SELECT stage, COUNT(*) as count, SUM(potential_revenue) as potential_revenue
-            FROM opportunities 
-            GROUP BY stage 
-            ORDER BY 
-                CASE stage
-                    WHEN 'Lead' THEN 1
-                    WHEN 'Prospect' THEN 2
-                    WHEN 'Proposal' THEN 3
-                    WHEN 'Negotiation' THEN 4
-                    WHEN 'Closed Won' THEN 5
-                    WHEN 'Closed Lost' THEN 6
-                    ELSE 7
-                END
-            """
-            stage_distribution = pd.read_sql(query, self.conn)
-            
-            # Get open vs closed opportunities
-            query = """
-            SELECT 
-                CASE 
-                    WHEN stage IN ('Closed Won', 'Closed Lost') THEN 'Closed'
-                    ELSE 'Open'
-                END as status,
-                COUNT(*) as count,
-                SUM(potential_revenue) as potential_revenue
-            FROM opportunities
-            GROUP BY status
-            """
-            open_vs_closed = pd.read_sql(query, self.conn)
-            
-            # Get win rate
-            query = """
-            SELECT 
-                COUNT(CASE WHEN stage = 'Closed Won' THEN 1 END) as won_count,
-                COUNT(CASE WHEN stage = 'Closed Lost' THEN 1 END) as lost_count,
-                COUNT(CASE WHEN stage IN ('Closed Won', 'Closed Lost') THEN 1 END) as total_closed
-            FROM opportunities
-            """
-            win_rate_data = pd.read_sql(query, self.conn)
-            
-            if win_rate_data['total_closed'].iloc[0] > 0:
-                win_rate = (win_rate_data['won_count'].iloc[0] / win_rate_data['total_closed'].iloc[0]) * 100
-            else:
-                win_rate = 0
-            
-            # Get weighted pipeline value
-            query = """
-            SELECT 
-                SUM(potential_revenue * (probability / 100)) as weighted_value,
-                SUM(potential_revenue) as total_value
-            FROM opportunities
-            WHERE stage NOT IN ('Closed Won', 'Closed Lost')
-            """
-            pipeline_value = pd.read_sql(query, self.conn)
-            
-            # Get top opportunities
-            query = """
+        # Stage distribution, open/closed split, win rate and pipeline value are
+        # all derived from the shared per-stage summary
+        summary = self._stage_summary()
+        total_opportunities = int(summary['count'].sum())
+        
+        # Get stage distribution
+        stage_distribution = summary[['stage', 'count', 'potential_revenue']]
+        
+        # Get open vs closed opportunities
+        is_closed = summary['stage'].isin(['Closed Won', 'Closed Lost'])
+        open_vs_closed = (
+            summary[['count', 'potential_revenue']]
+            .groupby(np.where(is_closed, 'Closed', 'Open'))
+            .sum(min_count=1)
+            .rename_axis('status')
+            .reset_index()
+        )
+        
+        # Get win rate
+        counts = dict(zip(summary['stage'].to_numpy(), summary['count'].to_numpy()))
+        won_count = counts.get('Closed Won', 0)
+        lost_count = counts.get('Closed Lost', 0)
+        total_closed = won_count + lost_count
+        
+        if total_closed > 0:
+            win_rate = (won_count / total_closed) * 100
+        else:
+            win_rate = 0
+        
+        # Get weighted pipeline value
+        open_stages = summary[summary['stage'].notna() & ~is_closed]
+        pipeline_value = pd.DataFrame({
+            'weighted_value': [open_stages['weighted_value'].sum(min_count=1)],
+            'total_value': [open_stages['potential_revenue'].sum(min_count=1)]
+        })
+        
+        # Get top opportunities; the ten largest open deals are picked off the
+        # partial revenue index first and only those rows are joined for names
+        query = """
+        WITH top AS (
             SELECT 
                 o.opportunity_id,
-                c.name as client_name,
-                p.name as program_name,
+                o.client_id,
+                o.program_id,
                 o.potential_revenue,
                 o.stage,
                 o.probability,
                 o.expected_close_date
             FROM opportunities o
-            JOIN clients c ON o.client_id = c.client_id
-            JOIN programs p ON o.program_id = p.program_id
             WHERE o.stage NOT IN ('Closed Won', 'Closed Lost')
+                AND EXISTS (SELECT 1 FROM clients c WHERE c.client_id = o.client_id)
+                AND EXISTS (SELECT 1 FROM programs p WHERE p.program_id = o.program_id)
             ORDER BY o.potential_revenue DESC
             LIMIT 10
-            """
-            top_opportunities = pd.read_sql(query, self.conn)
-            
-            return {
-                'total_opportunities': total_opportunities,
-                'stage_distribution': stage_distribution,
-                'open_vs_closed': open_vs_closed,
-                'win_rate': win_rate,
-                'pipeline_value': pipeline_value,
-                'top_opportunities': top_opportunities
-            }
-        except Exception as e:
-            return {'error': str(e)}
+        )
+        SELECT 
+            t.opportunity_id,
+            c.name as client_name,
+            p.name as program_name,
+            t.potential_revenue,
+            t.stage,
+            t.probability,
+            t.expected_close_date
+        FROM top t
+        JOIN clients c ON t.client_id = c.client_id
+        JOIN programs p ON t.program_id = p.program_id
+        ORDER BY t.potential_revenue DESC
+        """
+        top_opportunities = self._query(query)
+        
+        return {
+            'total_opportunities': total_opportunities,
+            'stage_distribution': stage_distribution,
+            'open_vs_closed': open_vs_closed,
+            'win_rate': win_rate,
+            'pipeline_value': pipeline_value,
+            'top_opportunities': top_opportunities
+        }
     
+    @_cached_analysis
     def analyze_conversion_rates(self):
         """
         Analyze pipeline conversion rates
@@ -124,105 +304,79 @@ class OpportunityAnalyzer:
         Returns:
             dict: Conversion rate analysis
         """
-        try:
-            # Get stage counts
-            query = """
-            SELECT stage, COUNT(*) as count
-            FROM opportunities 
-            GROUP BY stage 
-            ORDER BY 
-                CASE stage
-                    WHEN 'Lead' THEN 1
-                    WHEN 'Prospect' THEN 2
-                    WHEN 'Proposal' THEN 3
-                    WHEN 'Negotiation' THEN 4
-                    WHEN 'Closed Won' THEN 5
-                    WHEN 'Closed Lost' THEN 6
-                    ELSE 7
-                END
-            """
-            stage_counts = pd.read_sql(query, self.conn)
-            
-            # Calculate conversion rates between stages
-            if not stage_counts.empty:
-                stage_order = ['Lead', 'Prospect', 'Proposal', 'Negotiation', 'Closed Won']
-                conversion_rates = []
-                
-                for i in range(len(stage_order) - 1):
-                    current_stage = stage_order[i]
-                    next_stage = stage_order[i + 1]
-                    
-                    current_count = stage_counts[stage_counts['stage'] == current_stage]['count'].iloc[0] if current_stage in stage_counts['stage'].values else 0
-                    next_count = stage_counts[stage_counts['stage'] == next_stage]['count'].iloc[0] if next_stage in stage_counts['stage'].values else 0
-                    
-                    if current_count > 0:
-                        conversion_rate = (next_count / current_count) * 100
-                    else:
-                        conversion_rate = 0
-                    
-                    conversion_rates.append({
-                        'from_stage': current_stage,
-                        'to_stage': next_stage,
-                        'conversion_rate': conversion_rate
-                    })
-                
-                conversion_rates_df = pd.DataFrame(conversion_rates)
-            else:
-                conversion_rates_df = pd.DataFrame(columns=['from_stage', 'to_stage', 'conversion_rate'])
-            
-            # Get overall lead-to-win rate
-            lead_count = stage_counts[stage_counts['stage'] == 'Lead']['count'].iloc[0] if 'Lead' in stage_counts['stage'].values else 0
-            won_count = stage_counts[stage_counts['stage'] == 'Closed Won']['count'].iloc[0] if 'Closed Won' in stage_counts['stage'].values else 0
-            
-            if lead_count > 0:
-                lead_to_win_rate = (won_count / lead_count) * 100
-            else:
-                lead_to_win_rate = 0
-            
-            # Get conversion by client industry
-            query = """
-            SELECT 
-                c.industry,
-                COUNT(CASE WHEN o.stage = 'Closed Won' THEN 1 END) as won_count,
-                COUNT(CASE WHEN o.stage = 'Closed Lost' THEN 1 END) as lost_count,
-                COUNT(*) as total_count
-            FROM opportunities o
-            JOIN clients c ON o.client_id = c.client_id
-            WHERE c.industry IS NOT NULL
-            GROUP BY c.industry
-            """
-            conversion_by_industry = pd.read_sql(query, self.conn)
-            
-            if not conversion_by_industry.empty:
-                conversion_by_industry['win_rate'] = (conversion_by_industry['won_count'] / conversion_by_industry['total_count']) * 100
-            
-            # Get conversion by program category
-            query = """
-            SELECT 
-                p.category,
-                COUNT(CASE WHEN o.stage = 'Closed Won' THEN 1 END) as won_count,
-                COUNT(CASE WHEN o.stage = 'Closed Lost' THEN 1 END) as lost_count,
-                COUNT(*) as total_count
-            FROM opportunities o
-            JOIN programs p ON o.program_id = p.program_id
-            WHERE p.category IS NOT NULL
-            GROUP BY p.category
-            """
-            conversion_by_category = pd.read_sql(query, self.conn)
-            
-            if not conversion_by_category.empty:
-                conversion_by_category['win_rate'] = (conversion_by_category['won_count'] / conversion_by_category['total_count']) * 100
-            
-            return {
-                'stage_counts': stage_counts,
-                'conversion_rates': conversion_rates_df,
-                'lead_to_win_rate': lead_to_win_rate,
-                'conversion_by_industry': conversion_by_industry,
-                'conversion_by_category': conversion_by_category
-            }
-        except Exception as e:
-            return {'error': str(e)}
+        # Get stage counts
+        stage_counts = self._stage_summary()[['stage', 'count']]
+        counts = dict(zip(stage_counts['stage'].to_numpy(), stage_counts['count'].to_numpy()))
+        
+        # Calculate conversion rates between stages
+        if not stage_counts.empty:
+            stage_order = ['Lead', 'Prospect', 'Proposal', 'Negotiation', 'Closed Won']
+            stage_totals = stage_counts.set_index('stage')['count'].reindex(stage_order).fillna(0).to_numpy()
+            current_counts, next_counts = stage_totals[:-1], stage_totals[1:]
+            
+            conversion_rates_df = pd.DataFrame({
+                'from_stage': stage_order[:-1],
+                'to_stage': stage_order[1:],
+                'conversion_rate': np.divide(next_counts, current_counts, out=np.zeros(len(current_counts)), where=current_counts > 0) * 100
+            })
+        else:
+            conversion_rates_df = pd.DataFrame(columns=['from_stage', 'to_stage', 'conversion_rate'])
+        
+        # Get overall lead-to-win rate
+        lead_count = counts.get('Lead', 0)
+        won_count = counts.get('Closed Won', 0)
+        
+        if lead_count > 0:
+            lead_to_win_rate = (won_count / lead_count) * 100
+        else:
+            lead_to_win_rate = 0
+        
+        # Get conversion by client industry and by program category in one round trip
+        query = """
+        SELECT 
+            'industry' as dimension,
+            c.industry as value,
+            COUNT(CASE WHEN o.stage = 'Closed Won' THEN 1 END) as won_count,
+            COUNT(CASE WHEN o.stage = 'Closed Lost' THEN 1 END) as lost_count,
+            COUNT(*) as total_count,
+            100.0 * COUNT(CASE WHEN o.stage = 'Closed Won' THEN 1 END) / NULLIF(COUNT(*), 0) as win_rate
+        FROM opportunities o
+        JOIN clients c ON o.client_id = c.client_id
+        WHERE c.industry IS NOT NULL
+        GROUP BY c.industry
+        UNION ALL
+        SELECT 
+            'category' as dimension,
+            p.category as value,
+            COUNT(CASE WHEN o.stage = 'Closed Won' THEN 1 END) as won_count,
+            COUNT(CASE WHEN o.stage = 'Closed Lost' THEN 1 END) as lost_count,
+            COUNT(*) as total_count,
+            100.0 * COUNT(CASE WHEN o.stage = 'Closed Won' THEN 1 END) / NULLIF(COUNT(*), 0) as win_rate
+        FROM opportunities o
+        JOIN programs p ON o.program_id = p.program_id
+        WHERE p.category IS NOT NULL
+        GROUP BY p.category
+        ORDER BY dimension, value
+        """
+        conversion_by_dimension = self._query(query, dtype={'won_count': 'int64', 'lost_count': 'int64', 'total_count': 'int64', 'win_rate': 'float64'})
+        
+        conversion_by_industry, conversion_by_category = (
+            conversion_by_dimension[conversion_by_dimension['dimension'] == dimension]
+            .drop(columns='dimension')
+            .rename(columns={'value': dimension})
+            .reset_index(drop=True)
+            for dimension in ('industry', 'category')
+        )
+        
+        return {
+            'stage_counts': stage_counts,
+            'conversion_rates': conversion_rates_df,
+            'lead_to_win_rate': lead_to_win_rate,
+            'conversion_by_industry': conversion_by_industry,
+            'conversion_by_category': conversion_by_category
+        }
     
+    @_cached_analysis
     def analyze_sales_velocity(self):
         """
         Analyze sales velocity (how quickly opportunities move through the pipeline)
@@ -230,110 +384,76 @@ class OpportunityAnalyzer:
         Returns:
             dict: Sales velocity analysis
         """
-        try:
-            # Get average days in each stage
-            query = """
-            WITH stage_transitions AS (
-                SELECT 
-                    opportunity_id,
-                    stage,
-                    created_date as start_date,
-                    CASE 
-                        WHEN stage IN ('Closed Won', 'Closed Lost') THEN actual_close_date
-                        ELSE last_updated
-                    END as end_date
-                FROM opportunities
-            )
+        # Get average days in each stage
+        query = """
+        WITH stage_transitions AS (
             SELECT 
+                opportunity_id,
                 stage,
-                AVG(julianday(end_date) - julianday(start_date)) as avg_days_in_stage,
-                COUNT(*) as opportunity_count
-            FROM stage_transitions
-            WHERE start_date IS NOT NULL AND end_date IS NOT NULL
-            GROUP BY stage
-            ORDER BY 
-                CASE stage
-                    WHEN 'Lead' THEN 1
-                    WHEN 'Prospect' THEN 2
-                    WHEN 'Proposal' THEN 3
-                    WHEN 'Negotiation' THEN 4
-                    WHEN 'Closed Won' THEN 5
-                    WHEN 'Closed Lost' THEN 6
-                    ELSE 7
-                END
-            """
-            days_in_stage = pd.read_sql(query, self.conn)
-            
-            # Get average days to close
-            query = """
-            SELECT 
-                AVG(julianday(actual_close_date) - julianday(created_date)) as avg_days_to_close,
-                COUNT(*) as opportunity_count
+                created_date as start_date,
+                CASE 
+                    WHEN stage IN ('Closed Won', 'Closed Lost') THEN actual_close_date
+                    ELSE last_updated
+                END as end_date
             FROM opportunities
-            WHERE stage IN ('Closed Won', 'Closed Lost') 
-                AND created_date IS NOT NULL 
-                AND actual_close_date IS NOT NULL
-            """
-            days_to_close = pd.read_sql(query, self.conn)
-            
-            avg_days_to_close = days_to_close['avg_days_to_close'].iloc[0] if not days_to_close.empty and not pd.isna(days_to_close['avg_days_to_close'].iloc[0]) else 0
-            
-            # Get average days to close by outcome
-            query = """
+        ),
+        stage_days AS (
             SELECT 
                 stage,
-                AVG(julianday(actual_close_date) - julianday(created_date)) as avg_days_to_close,
+                AVG(julianday(end_date) - julianday(start_date)) as avg_days_in_stage,
                 COUNT(*) as opportunity_count
-            FROM opportunities
-            WHERE stage IN ('Closed Won', 'Closed Lost') 
-                AND created_date IS NOT NULL 
-                AND actual_close_date IS NOT NULL
+            FROM stage_transitions
+            WHERE start_date IS NOT NULL AND end_date IS NOT NULL
             GROUP BY stage
-            """
-            days_by_outcome = pd.read_sql(query, self.conn)
-            
-            # Get sales velocity by client industry
-            query = """
-            SELECT 
-                c.industry,
-                AVG(julianday(o.actual_close_date) - julianday(o.created_date)) as avg_days_to_close,
-                COUNT(*) as opportunity_count
-            FROM opportunities o
-            JOIN clients c ON o.client_id = c.client_id
-            WHERE o.stage IN ('Closed Won', 'Closed Lost') 
-                AND o.created_date IS NOT NULL 
-                AND o.actual_close_date IS NOT NULL
-                AND c.industry IS NOT NULL
-            GROUP BY c.industry
-            """
-            velocity_by_industry = pd.read_sql(query, self.conn)
-            
-            # Get sales velocity by program category
-            query = """
-            SELECT 
-                p.category,
-                AVG(julianday(o.actual_close_date) - julianday(o.created_date)) as avg_days_to_close,
-                COUNT(*) as opportunity_count
-            FROM opportunities o
-            JOIN programs p ON o.program_id = p.program_id
-            WHERE o.stage IN ('Closed Won', 'Closed Lost') 
-                AND o.created_date IS NOT NULL 
-                AND o.actual_close_date IS NOT NULL
-                AND p.category IS NOT NULL
-            GROUP BY p.category
-            """
-            velocity_by_category = pd.read_sql(query, self.conn)
-            
-            return {
-                'days_in_stage': days_in_stage,
-                'avg_days_to_close': avg_days_to_close,
-                'days_by_outcome': days_by_outcome,
-                'velocity_by_industry': velocity_by_industry,
-                'velocity_by_category': velocity_by_category
-            }
-        except Exception as e:
-            return {'error': str(e)}
+        )
+        SELECT d.stage, d.avg_days_in_stage, d.opportunity_count
+        FROM stage_days d
+        LEFT JOIN stage_order so ON so.stage = d.stage
+        ORDER BY COALESCE(so.ord, 7)
+        """
+        days_in_stage = self._query(query)
+        
+        # Fetch the closed opportunities once with their industry and category;
+        # the overall, per-outcome and per-dimension velocities are grouped from it
+        query = """
+        SELECT 
+            o.stage,
+            julianday(o.actual_close_date) - julianday(o.created_date) as days_to_close,
+            c.industry,
+            p.category
+        FROM opportunities o
+        LEFT JOIN clients c ON o.client_id = c.client_id
+        LEFT JOIN programs p ON o.program_id = p.program_id
+        WHERE o.stage IN ('Closed Won', 'Closed Lost') 
+            AND o.created_date IS NOT NULL 
+            AND o.actual_close_date IS NOT NULL
+        """
+        closed = self._query(query, dtype={'days_to_close': 'float64'})
+        
+        # Get average days to close
+        avg_days_to_close = closed['days_to_close'].mean()
+        
+        if pd.isna(avg_days_to_close):
+            avg_days_to_close = 0
+        
+        # Get average days to close by outcome, client industry and program category
+        days_by_outcome, velocity_by_industry, velocity_by_category = (
+            closed.dropna(subset=[dimension])
+            .groupby(dimension)
+            .agg(avg_days_to_close=('days_to_close', 'mean'), opportunity_count=('days_to_close', 'size'))
+            .reset_index()
+            for dimension in ('stage', 'industry', 'category')
+        )
+        
+        return {
+            'days_in_stage': days_in_stage,
+            'avg_days_to_close': avg_days_to_close,
+            'days_by_outcome': days_by_outcome,
+            'velocity_by_industry': velocity_by_industry,
+            'velocity_by_category': velocity_by_category
+        }
     
+    @_cached_analysis
     def generate_sales_forecast(self, forecast_periods=3, period_type='month'):
         """
         Generate sales forecast based on pipeline and historical data
@@ -345,146 +465,139 @@ class OpportunityAnalyzer:
         Returns:
             dict: Sales forecast
         """
-        try:
-            # Get current date
-            current_date = datetime.now()
-            
-            # Define period start and end dates
-            period_dates = []
-            for i in range(forecast_periods):
-                if period_type == 'month':
-                    start_date = current_date + timedelta(days=30 * i)
-                    end_date = current_date + timedelta(days=30 * (i + 1))
-                elif period_type == 'quarter':
-                    start_date = current_date + timedelta(days=90 * i)
-                    end_date = current_date + timedelta(days=90 * (i + 1))
-                elif period_type == 'year':
-                    start_date = current_date + timedelta(days=365 * i)
-                    end_date = current_date + timedelta(days=365 * (i + 1))
-                
-                period_dates.append({
-                    'period': i + 1,
-                    'start_date': start_date.strftime('%Y-%m-%d'),
-                    'end_date': end_date.strftime('%Y-%m-%d')
-                })
+        if period_type not in ('month', 'quarter', 'year'):
+            raise ValueError(f"Unsupported period type: {period_type}")
+        
+        # Get current date
+        current_date = datetime.now()
+        
+        # Define period start and end dates (fixed-length periods from today); a
+        # negative period count yields no periods and an empty forecast
+        period_length = {'month': '30D', 'quarter': '90D', 'year': '365D'}[period_type]
+        edges = pd.date_range(start=current_date, periods=max(forecast_periods, 0) + 1, freq=period_length).strftime('%Y-%m-%d').to_numpy()
+        period_dates = [
+            {'period': i + 1, 'start_date': edges[i], 'end_date': edges[i + 1]}
+            for i in range(forecast_periods)
+        ]
+        
+        # Get weighted pipeline value for every period in one query, bucketing
+        # opportunities against a VALUES list of period ranges
+        pipeline_forecast = []
+        if period_dates:
+            query = f"""
+            WITH periods(period, start_date, end_date) AS (
+                VALUES {', '.join(['(?, ?, ?)'] * len(period_dates))}
+            )
+            SELECT 
+                p.period,
+                SUM(o.potential_revenue * (o.probability / 100)) as weighted_value,
+                SUM(o.potential_revenue) as total_value,
+                COUNT(o.opportunity_id) as opportunity_count
+            FROM periods p
+            LEFT JOIN opportunities o
+                ON o.stage NOT IN ('Closed Won', 'Closed Lost')
+                AND o.expected_close_date >= p.start_date
+                AND o.expected_close_date < p.end_date
+            GROUP BY p.period
+            """
+            params = [value for period in period_dates for value in (period['period'], period['start_date'], period['end_date'])]
+            period_data = self._query(query, params).set_index('period')
             
-            # Get weighted pipeline value for each period
-            pipeline_forecast = []
             for period in period_dates:
-                query = f"""
-                SELECT 
-                    SUM(potential_revenue * (probability / 100)) as weighted_value,
-                    SUM(potential_revenue) as total_value,
-                    COUNT(*) as opportunity_count
-                FROM opportunities
-                WHERE stage NOT IN ('Closed Won', 'Closed Lost')
-                    AND expected_close_date >= '{period['start_date']}'
-                    AND expected_close_date < '{period['end_date']}'
-                """
-                period_data = pd.read_sql(query, self.conn)
-                
+                totals = period_data.loc[period['period']]
                 pipeline_forecast.append({
                     'period': period['period'],
                     'period_name': f"Period {period['period']}",
                     'start_date': period['start_date'],
                     'end_date': period['end_date'],
-                    'weighted_value': period_data['weighted_value'].iloc[0] if not pd.isna(period_data['weighted_value'].iloc[0]) else 0,
-                    'total_value': period_data['total_value'].iloc[0] if not pd.isna(period_data['total_value'].iloc[0]) else 0,
-                    'opportunity_count': period_data['opportunity_count'].iloc[0]
+                    'weighted_value': totals['weighted_value'] if not pd.isna(totals['weighted_value']) else 0,
+                    'total_value': totals['total_value'] if not pd.isna(totals['total_value']) else 0,
+                    'opportunity_count': int(totals['opportunity_count'])
                 })
-            
-            pipeline_forecast_df = pd.DataFrame(pipeline_forecast)
-            
-            # Get historical win rate
-            query = """
-            SELECT 
-                COUNT(CASE WHEN stage = 'Closed Won' THEN 1 END) as won_count,
-                COUNT(CASE WHEN stage IN ('Closed Won', 'Closed Lost') THEN 1 END) as total_closed
-            FROM opportunities
-            WHERE actual_close_date IS NOT NULL
-            """
-            win_rate_data = pd.read_sql(query, self.conn)
-            
-            if win_rate_data['total_closed'].iloc[0] > 0:
-                historical_win_rate = (win_rate_data['won_count'].iloc[0] / win_rate_data['total_closed'].iloc[0])
+        
+        pipeline_forecast_df = pd.DataFrame(pipeline_forecast)
+        
+        # Get historical win rate
+        query = """
+        SELECT 
+            COUNT(CASE WHEN stage = 'Closed Won' THEN 1 END) as won_count,
+            COUNT(CASE WHEN stage IN ('Closed Won', 'Closed Lost') THEN 1 END) as total_closed
+        FROM opportunities
+        WHERE actual_close_date IS NOT NULL
+        """
+        won_count, total_closed = self.conn.execute(query).fetchone()
+        
+        if total_closed > 0:
+            historical_win_rate = won_count / total_closed
+        else:
+            historical_win_rate = 0
+        
+        # Get historical average deal size
+        query = """
+        SELECT AVG(potential_revenue) as avg_deal_size
+        FROM opportunities
+        WHERE stage = 'Closed Won'
+        """
+        historical_avg_deal_size = self.conn.execute(query).fetchone()[0]
+        
+        if historical_avg_deal_size is None:
+            historical_avg_deal_size = 0
+        
+        # Get historical sales by month; quarters and years are rolled up from the
+        # monthly totals in pandas rather than formatted per row in SQLite. Deals
+        # whose close date doesn't parse stay in a NULL period for every period type
+        query = """
+        SELECT 
+            strftime('%Y-%m', actual_close_date) as period,
+            SUM(potential_revenue) as total_revenue,
+            COUNT(*) as deal_count
+        FROM opportunities
+        WHERE stage = 'Closed Won' AND actual_close_date IS NOT NULL
+        GROUP BY period
+        ORDER BY period
+        """
+        historical_sales = self._query(query)
+        
+        if period_type in ('quarter', 'year'):
+            freq, label = {'quarter': ('Q', '%Y-Q%q'), 'year': ('Y', '%Y')}[period_type]
+            historical_sales['period'] = pd.PeriodIndex(historical_sales['period'], freq=freq).strftime(label)
+            historical_sales = historical_sales.groupby('period', as_index=False, dropna=False).sum(min_count=1).sort_values('period', na_position='first', ignore_index=True)
+        
+        # Historical-based forecast (simple average of past periods)
+        if not historical_sales.empty:
+            historical_avg = historical_sales['total_revenue'].mean()
+        else:
+            historical_avg = 0
+        
+        # Combined forecast (weighted average), blended for all periods at once
+        if not pipeline_forecast_df.empty:
+            pipeline_values = pipeline_forecast_df['weighted_value'].to_numpy()
+            if historical_avg > 0:
+                combined_forecast = np.where(pipeline_values > 0, (pipeline_values * 0.7) + (historical_avg * 0.3), historical_avg)
             else:
-                historical_win_rate = 0
-            
-            # Get historical average deal size
-            query = """
-            SELECT AVG(potential_revenue) as avg_deal_size
-            FROM opportunities
-            WHERE stage = 'Closed Won'
-            """
-            deal_size_data = pd.read_sql(query, self.conn)
-            
-            historical_avg_deal_size = deal_size_data['avg_deal_size'].iloc[0] if not deal_size_data.empty and not pd.isna(deal_size_data['avg_deal_size'].iloc[0]) else 0
-            
-            # Get historical sales by period
-            if period_type == 'month':
-                date_format = '%Y-%m'
-                group_by = "strftime('%Y-%m', actual_close_date)"
-            elif period_type == 'quarter':
-                date_format = '%Y-Q%Q'
-                group_by = "strftime('%Y-Q', actual_close_date) || ((strftime('%m', actual_close_date) + 2) / 3)"
-            elif period_type == 'year':
-                date_format = '%Y'
-                group_by = "strftime('%Y', actual_close_date)"
-            
-            query = f"""
-            SELECT 
-                {group_by} as period,
-                SUM(potential_revenue) as total_revenue,
-                COUNT(*) as deal_count
-            FROM opportunities
-            WHERE stage = 'Closed Won' AND actual_close_date IS NOT NULL
-            GROUP BY period
-            ORDER BY period
-            """
-            historical_sales = pd.read_sql(query, self.conn)
-            
-            # Calculate forecast based on historical data and pipeline
-            forecast = []
-            for period in pipeline_forecast:
-                # Pipeline-based forecast
-                pipeline_forecast_value = period['weighted_value']
-                
-                # Historical-based forecast (simple average of past periods)
-                if not historical_sales.empty:
-                    historical_avg = historical_sales['total_revenue'].mean()
-                else:
-                    historical_avg = 0
-                
-                # Combined forecast (weighted average)
-                if pipeline_forecast_value > 0 and historical_avg > 0:
-                    combined_forecast = (pipeline_forecast_value * 0.7) + (historical_avg * 0.3)
-                elif pipeline_forecast_value > 0:
-                    combined_forecast = pipeline_forecast_value
-                else:
-                    combined_forecast = historical_avg
-                
-                forecast.append({
-                    'period': period['period'],
-                    'period_name': f"Period {period['period']}",
-                    'start_date': period['start_date'],
-                    'end_date': period['end_date'],
-                    'pipeline_forecast': pipeline_forecast_value,
-                    'historical_forecast': historical_avg,
-                    'combined_forecast': combined_forecast
-                })
-            
-            forecast_df = pd.DataFrame(forecast)
-            
-            return {
-                'pipeline_forecast': pipeline_forecast_df,
-                'historical_win_rate': historical_win_rate,
-                'historical_avg_deal_size': historical_avg_deal_size,
-                'historical_sales': historical_sales,
-                'forecast': forecast_df
-            }
-        except Exception as e:
-            return {'error': str(e)}
+                combined_forecast = np.where(pipeline_values > 0, pipeline_values, historical_avg)
+            
+            forecast_df = pd.DataFrame({
+                'period': pipeline_forecast_df['period'],
+                'period_name': pipeline_forecast_df['period_name'],
+                'start_date': pipeline_forecast_df['start_date'],
+                'end_date': pipeline_forecast_df['end_date'],
+                'pipeline_forecast': pipeline_values,
+                'historical_forecast': historical_avg,
+                'combined_forecast': combined_forecast
+            })
+        else:
+            forecast_df = pd.DataFrame()
+        
+        return {
+            'pipeline_forecast': pipeline_forecast_df,
+            'historical_win_rate': historical_win_rate,
+            'historical_avg_deal_size': historical_avg_deal_size,
+            'historical_sales': historical_sales,
+            'forecast': forecast_df
+        }
     
+    @_cached_analysis
     def analyze_pipeline_trends(self):
         """
         Analyze pipeline trends over time
@@ -492,84 +605,87 @@ class OpportunityAnalyzer:
         Returns:
             dict: Pipeline trends analysis
         """
-        try:
-            # Get pipeline value over time
-            query = """
-            SELECT 
-                strftime('%Y-%m', created_date) as month,
-                SUM(CASE WHEN stage NOT IN ('Closed Won', 'Closed Lost') THEN potential_revenue * (probability / 100) ELSE 0 END) as weighted_pipeline,
-                SUM(CASE WHEN stage NOT IN ('Closed Won', 'Closed Lost') THEN potential_revenue ELSE 0 END) as total_pipeline,
-                COUNT(CASE WHEN stage NOT IN ('Closed Won', 'Closed Lost') THEN 1 END) as open_opportunities,
-                SUM(CASE WHEN stage = 'Closed Won' THEN potential_revenue ELSE 0 END) as closed_won_value,
-                COUNT(CASE WHEN stage = 'Closed Won' THEN 1 END) as closed_won_count
-            FROM opportunities
-            WHERE created_date IS NOT NULL
-            GROUP BY month
-            ORDER BY month
-            """
-            pipeline_over_time = pd.read_sql(query, self.conn)
-            
-            # Get win rate over time
-            query = """
-            SELECT 
-                strftime('%Y-%m', actual_close_date) as month,
-                COUNT(CASE WHEN stage = 'Closed Won' THEN 1 END) as won_count,
-                COUNT(CASE WHEN stage = 'Closed Lost' THEN 1 END) as lost_count,
-                COUNT(CASE WHEN stage IN ('Closed Won', 'Closed Lost') THEN 1 END) as total_closed
-            FROM opportunities
-            WHERE actual_close_date IS NOT NULL
-            GROUP BY month
-            ORDER BY month
-            """
-            win_rate_over_time = pd.read_sql(query, self.conn)
-            
-            if not win_rate_over_time.empty:
-                win_rate_over_time['win_rate'] = (win_rate_over_time['won_count'] / win_rate_over_time['total_closed']) * 100
-            
-            # Get average deal size over time
-            query = """
-            SELECT 
-                strftime('%Y-%m', actual_close_date) as month,
-                AVG(potential_revenue) as avg_deal_size,
-                COUNT(*) as deal_count
-            FROM opportunities
-            WHERE stage = 'Closed Won' AND actual_close_date IS NOT NULL
-            GROUP BY month
-            ORDER BY month
-            """
-            deal_size_over_time = pd.read_sql(query, self.conn)
-            
-            # Get stage distribution over time
-            query = """
-            SELECT 
-                strftime('%Y-%m', created_date) as month,
-                stage,
-                COUNT(*) as opportunity_count
-            FROM opportunities
-            WHERE created_date IS NOT NULL
-            GROUP BY month, stage
-            ORDER BY month, 
-                CASE stage
-                    WHEN 'Lead' THEN 1
-                    WHEN 'Prospect' THEN 2
-                    WHEN 'Proposal' THEN 3
-                    WHEN 'Negotiation' THEN 4
-                    WHEN 'Closed Won' THEN 5
-                    WHEN 'Closed Lost' THEN 6
-                    ELSE 7
-                END
-            """
-            stage_distribution_over_time = pd.read_sql(query, self.conn)
-            
-            return {
-                'pipeline_over_time': pipeline_over_time,
-                'win_rate_over_time': win_rate_over_time,
-                'deal_size_over_time': deal_size_over_time,
-                'stage_distribution_over_time': stage_distribution_over_time
-            }
-        except Exception as e:
-            return {'error': str(e)}
+        # Scan opportunities once, aggregated per (month, stage) both by created
+        # month and by close month; every trend below is derived from this frame
+        query = """
+        SELECT 
+            'created' as basis,
+            strftime('%Y-%m', created_date) as month,
+            stage,
+            COUNT(*) as opportunity_count,
+            SUM(potential_revenue) as total_value,
+            COUNT(potential_revenue) as valued_count,
+            SUM(potential_revenue * (probability / 100)) as weighted_value
+        FROM opportunities
+        WHERE created_date IS NOT NULL
+        GROUP BY month, stage
+        UNION ALL
+        SELECT 
+            'closed' as basis,
+            strftime('%Y-%m', actual_close_date) as month,
+            stage,
+            COUNT(*) as opportunity_count,
+            SUM(potential_revenue) as total_value,
+            COUNT(potential_revenue) as valued_count,
+            NULL as weighted_value
+        FROM opportunities
+        WHERE actual_close_date IS NOT NULL
+        GROUP BY month, stage
+        """
+        monthly = self._query(query, dtype={'opportunity_count': 'int64', 'total_value': 'float64', 'valued_count': 'int64', 'weighted_value': 'float64'})
+        created = monthly[monthly['basis'] == 'created']
+        closed = monthly[monthly['basis'] == 'closed']
+        
+        # Get pipeline value over time
+        is_open = created['stage'].notna() & ~created['stage'].isin(['Closed Won', 'Closed Lost'])
+        is_won = created['stage'] == 'Closed Won'
+        pipeline_over_time = pd.DataFrame({
+            'weighted_pipeline': created['weighted_value'].where(is_open, 0),
+            'total_pipeline': created['total_value'].where(is_open, 0),
+            'open_opportunities': created['opportunity_count'].where(is_open, 0),
+            'closed_won_value': created['total_value'].where(is_won, 0),
+            'closed_won_count': created['opportunity_count'].where(is_won, 0)
+        }).groupby(created['month'], dropna=False).sum(min_count=1).reset_index().sort_values('month', na_position='first', ignore_index=True)
+        
+        # Get win rate over time
+        win_rate_over_time = pd.DataFrame({
+            'won_count': closed['opportunity_count'].where(closed['stage'] == 'Closed Won', 0),
+            'lost_count': closed['opportunity_count'].where(closed['stage'] == 'Closed Lost', 0),
+            'total_closed': closed['opportunity_count'].where(closed['stage'].isin(['Closed Won', 'Closed Lost']), 0)
+        }).groupby(closed['month'], dropna=False).sum().reset_index().sort_values('month', na_position='first', ignore_index=True)
+        
+        if not win_rate_over_time.empty:
+            win_rate_over_time['win_rate'] = (win_rate_over_time['won_count'] / win_rate_over_time['total_closed']) * 100
+        
+        # Get average deal size over time
+        won = closed[closed['stage'] == 'Closed Won']
+        deal_size_over_time = pd.DataFrame({
+            'month': won['month'],
+            'avg_deal_size': won['total_value'] / won['valued_count'],
+            'deal_count': won['opportunity_count']
+        }).sort_values('month', na_position='first', ignore_index=True)
+        
+        # Get stage distribution over time, one column per stage in pipeline order;
+        # opportunities without a stage are counted under 'Unknown'
+        stage = created['stage'].fillna('Unknown')
+        stage_columns = list(_STAGE_RANK) + sorted(set(stage) - set(_STAGE_RANK))
+        stage_distribution_over_time = (
+            created['opportunity_count'].groupby([created['month'], stage], dropna=False).sum()
+            .unstack(fill_value=0)
+            .reindex(columns=stage_columns, fill_value=0)
+            .rename_axis(columns=None)
+            .reset_index()
+            .sort_values('month', na_position='first', ignore_index=True)
+        )
+        
+        return {
+            'pipeline_over_time': pipeline_over_time,
+            'win_rate_over_time': win_rate_over_time,
+            'deal_size_over_time': deal_size_over_time,
+            'stage_distribution_over_time': stage_distribution_over_time
+        }
     
+    @_cached_chart
     def create_pipeline_funnel_chart(self, data=None):
         """
         Create a pipeline funnel chart
@@ -580,6 +696,8 @@ class OpportunityAnalyzer:
         Returns:
             plotly.graph_objects.Figure: Pipeline funnel chart
         """
+        import plotly.graph_objects as go
+        
         if data is None:
             overview = self.get_pipeline_overview()
         else:
@@ -590,18 +708,10 @@ class OpportunityAnalyzer:
         
         # Create pipeline funnel chart
         if 'stage_distribution' in overview and not overview['stage_distribution'].empty:
-            # Define stage order
-            stage_order = ['Lead', 'Prospect', 'Proposal', 'Negotiation', 'Closed Won', 'Closed Lost']
-            
-            # Filter and sort data
-            df = overview['stage_distribution'].copy()
-            df = df[df['stage'].isin(stage_order)]
-            
-            # Create custom order for display (excluding Closed Lost at the bottom)
+            # Custom order for display (excluding Closed Lost), reversed so Lead sits at the bottom
             display_order = ['Lead', 'Prospect', 'Proposal', 'Negotiation', 'Closed Won']
-            display_df = df[df['stage'].isin(display_order)].copy()
-            display_df['stage'] = pd.Categorical(display_df['stage'], categories=display_order, ordered=True)
-            display_df = display_df.sort_values('stage', ascending=False)
+            stages = overview['stage_distribution'].set_index('stage')
+            display_df = stages.reindex([stage for stage in display_order[::-1] if stage in stages.index]).reset_index()
             
             fig = go.Figure(go.Funnel(
                 y=display_df['stage'],
@@ -622,6 +732,7 @@ class OpportunityAnalyzer:
         
         return None
     
+    @_cached_chart
     def create_pipeline_value_chart(self, data=None):
         """
         Create a pipeline value chart
@@ -632,6 +743,8 @@ class OpportunityAnalyzer:
         Returns:
             plotly.graph_objects.Figure: Pipeline value chart
         """
+        import plotly.graph_objects as go
+        
         if data is None:
             overview = self.get_pipeline_overview()
         else:
@@ -645,26 +758,27 @@ class OpportunityAnalyzer:
             # Define stage order
             stage_order = ['Lead', 'Prospect', 'Proposal', 'Negotiation', 'Closed Won']
             
-            # Filter and sort data
-            df = overview['stage_distribution'].copy()
-            df = df[df['stage'].isin(stage_order)]
-            df['stage'] = pd.Categorical(df['stage'], categories=stage_order, ordered=True)
-            df = df.sort_values('stage')
+            # Filter and order data
+            stages = overview['stage_distribution'].set_index('stage')
+            df = stages.reindex([stage for stage in stage_order if stage in stages.index]).reset_index()
             
-            fig = px.bar(
-                df,
-                x='stage',
-                y='potential_revenue',
+            fig = go.Figure(go.Bar(
+                x=df['stage'].tolist(),
+                y=df['potential_revenue'].tolist(),
+                marker_color=[_STAGE_COLORS.get(stage, _OTHER_STAGE_COLOR) for stage in df['stage']],
+                texttemplate='$%{y:,.0f}',
+                textposition='outside'
+            ))
+            fig.update_layout(
                 title='Pipeline Value by Stage',
-                color='stage',
-                text_auto=True
+                xaxis_title='Stage',
+                yaxis_title='Potential Revenue ($)'
             )
-            fig.update_traces(texttemplate='$%{y:,.0f}', textposition='outside')
-            fig.update_layout(xaxis_title='Stage', yaxis_title='Potential Revenue ($)')
             return fig
         
         return None
     
+    @_cached_chart
     def create_win_rate_chart(self, data=None):
         """
         Create a win rate chart
@@ -675,6 +789,8 @@ class OpportunityAnalyzer:
         Returns:
             plotly.graph_objects.Figure: Win rate chart
         """
+        import plotly.express as px
+        
         if data is None:
             conversion_data = self.analyze_conversion_rates()
         else:
@@ -702,6 +818,7 @@ class OpportunityAnalyzer:
         
         return None
     
+    @_cached_chart
     def create_conversion_rates_chart(self, data=None):
         """
         Create a conversion rates chart
@@ -712,6 +829,8 @@ class OpportunityAnalyzer:
         Returns:
             plotly.graph_objects.Figure: Conversion rates chart
         """
+        import plotly.express as px
+        
         if data is None:
             conversion_data = self.analyze_conversion_rates()
         else:
@@ -722,7 +841,7 @@ class OpportunityAnalyzer:
         
         # Create conversion rates chart
         if 'conversion_rates' in conversion_data and not conversion_data['conversion_rates'].empty:
-            df = conversion_data['conversion_rates']
+            df = _sort_by_stage(conversion_data['conversion_rates'], 'from_stage')
             
             fig = px.bar(
                 df,
@@ -735,15 +854,12 @@ class OpportunityAnalyzer:
                 hover_data=['to_stage']
             )
             fig.update_traces(texttemplate='%{y:.1f}%', textposition='outside')
-            fig.update_layout(
-                xaxis_title='From Stage',
-                yaxis_title='Conversion Rate (%)',
-                xaxis={'categoryorder': 'array', 'categoryarray': ['Lead', 'Prospect', 'Proposal', 'Negotiation']}
-            )
+            fig.update_layout(xaxis_title='From Stage', yaxis_title='Conversion Rate (%)')
             return fig
         
         return None
     
+    @_cached_chart
     def create_sales_velocity_chart(self, data=None):
         """
         Create a sales velocity chart
@@ -754,6 +870,8 @@ class OpportunityAnalyzer:
         Returns:
             plotly.graph_objects.Figure: Sales velocity chart
         """
+        import plotly.graph_objects as go
+        
         if data is None:
             velocity_data = self.analyze_sales_velocity()
         else:
@@ -764,26 +882,25 @@ class OpportunityAnalyzer:
         
         # Create days in stage chart
         if 'days_in_stage' in velocity_data and not velocity_data['days_in_stage'].empty:
-            df = velocity_data['days_in_stage']
-            
-            fig = px.bar(
-                df,
-                x='stage',
-                y='avg_days_in_stage',
-                title='Average Days in Each Pipeline Stage',
-                color='stage',
-                text_auto=True
-            )
-            fig.update_traces(texttemplate='%{y:.1f} days', textposition='outside')
+            df = _sort_by_stage(velocity_data['days_in_stage'])
+            
+            fig = go.Figure(go.Bar(
+                x=df['stage'].tolist(),
+                y=df['avg_days_in_stage'].tolist(),
+                marker_color=[_STAGE_COLORS.get(stage, _OTHER_STAGE_COLOR) for stage in df['stage']],
+                texttemplate='%{y:.1f} days',
+                textposition='outside'
+            ))
             fig.update_layout(
+                title='Average Days in Each Pipeline Stage',
                 xaxis_title='Stage',
-                yaxis_title='Average Days',
-                xaxis={'categoryorder': 'array', 'categoryarray': ['Lead', 'Prospect', 'Proposal', 'Negotiation', 'Closed Won', 'Closed Lost']}
+                yaxis_title='Average Days'
             )
             return fig
         
         return None
     
+    @_cached_chart
     def create_forecast_chart(self, data=None, forecast_periods=3):
         """
         Create a sales forecast chart
@@ -795,6 +912,8 @@ class OpportunityAnalyzer:
         Returns:
             plotly.graph_objects.Figure: Forecast chart
         """
+        import plotly.graph_objects as go
+        
         if data is None:
             forecast_data = self.generate_sales_forecast(forecast_periods=forecast_periods)
         else:
@@ -826,7 +945,7 @@ class OpportunityAnalyzer:
             ))
             
             # Add combined forecast line
-            fig.add_trace(go.Scatter(
+            fig.add_trace(go.Scattergl(
                 x=df['period_name'],
                 y=df['combined_forecast'],
                 name='Combined Forecast',
@@ -853,6 +972,7 @@ class OpportunityAnalyzer:
         
         return None
     
+    @_cached_chart
     def create_pipeline_trends_chart(self, data=None):
         """
         Create a pipeline trends chart
@@ -863,6 +983,9 @@ class OpportunityAnalyzer:
         Returns:
             plotly.graph_objects.Figure: Pipeline trends chart
         """
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        
         if data is None:
             trends_data = self.analyze_pipeline_trends()
         else:
@@ -891,7 +1014,7 @@ class OpportunityAnalyzer:
             
             # Add closed won value line chart
             fig.add_trace(
-                go.Scatter(
+                go.Scattergl(
                     x=df['month'],
                     y=df['closed_won_value'],
                     name='Closed Won Value',
@@ -903,7 +1026,7 @@ class OpportunityAnalyzer:
             
             # Add open opportunities line chart
             fig.add_trace(
-                go.Scatter(
+                go.Scattergl(
                     x=df['month'],
                     y=df['open_opportunities'],
                     name='Open Opportunities',
@@ -935,9 +1058,8 @@ class OpportunityAnalyzer:
         return None
     
     def close(self):
-        """Close the database connection"""
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
+        """Release the database connection (the shared connection itself stays open for other analyzers)"""
+        self.conn = None
 
 
 # Example usage:
@@ -3,10 +3,76 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import plotly.io as pio
 import streamlit as st
 import sqlite3
 import io
 import base64
+import html
+import textwrap
+import functools
+
+# Row template for the program report enrollment table
+_ENROLL_ROW_TPL = '<tr>' + ''.join(
+    f'<td>{{{c}}}</td>' for c in ('client_name', 'start_date', 'delivery_mode', 'participants', 'revenue', 'profit', 'margin')
+) + '</tr>\n'
+
+# Static head of the program report; only the program name is substituted per call
+_PROGRAM_REPORT_HEAD = textwrap.dedent("""\
+    <html>
+    <head>
+        <title>Program Report: {program_name}</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; margin: 20px; }}
+            h1 {{ color: #2c3e50; }}
+            h2 {{ color: #3498db; margin-top: 30px; }}
+            .program-info {{ display: flex; flex-wrap: wrap; gap: 20px; margin: 20px 0; }}
+            .info-box {{ background-color: #f8f9fa; border-radius: 5px; padding: 15px; min-width: 200px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }}
+            .info-label {{ font-size: 14px; color: #7f8c8d; }}
+            .info-value {{ font-size: 18px; color: #2c3e50; }}
+            .chart-container {{ margin: 30px 0; }}
+            table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
+            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+            th {{ background-color: #f2f2f2; }}
+            tr:nth-child(even) {{ background-color: #f9f9f9; }}
+        </style>
+    </head>
+    <body>
+        <h1>Program Report: {program_name}</h1>
+""")
+
+def _figure_to_json(fig):
+    """
+    Serialize a figure for embedding in an HTML report (orjson, no schema validation).
+    The layout template is left out; plotly.js falls back to its own defaults, which
+    keeps tens of KB of colorway/axis defaults out of every embedded chart.
+    """
+    fig_dict = fig.to_plotly_json()
+    layout = {key: value for key, value in fig_dict['layout'].items() if key != 'template'}
+    return pio.json.to_json_plotly({'data': fig_dict['data'], 'layout': layout}, engine='orjson')
+
+@functools.lru_cache(maxsize=None)
+def _trends_prototype():
+    """
+    Layout prototype for the program report trends chart, built once per process.
+    Each report copies it with go.Figure() and adds its own traces.
+    """
+    proto = make_subplots(specs=[[{"secondary_y": True}]])
+    proto.update_layout(
+        title='Program Performance Over Time',
+        xaxis_title='Month',
+        barmode='group',
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    proto.update_yaxes(title_text="Amount ($)", secondary_y=False)
+    proto.update_yaxes(title_text="Profit Margin (%)", secondary_y=True)
+    return proto
 
 class VisualizationGenerator:
     """
@@ -17,7 +83,8 @@ class VisualizationGenerator:
     def __init__(self, db_path='data/teaching_analytics.db'):
         """Initialize the generator with database connection"""
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        # Used from one thread at a time, but an owner may close it from another
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
         
         # Set default color schemes
         self.color_schemes = {
@@ -29,6 +96,10 @@ class VisualizationGenerator:
             'profit': 'rgb(46, 184, 46)',
             'margin': 'rgb(255, 127, 14)'
         }
+        
+        # Immutable copy of the categorical palette shared by every pie/bar chart
+        self._categorical_colors = tuple(self.color_schemes['categorical'])
+
     
     def create_dashboard_summary(self):
         """
@@ -271,7 +342,7 @@ class VisualizationGenerator:
                     values='client_count', 
                     names='industry',
                     title='Client Distribution by Industry',
-                    color_discrete_sequence=self.color_schemes['categorical']
+                    color_discrete_sequence=self._categorical_colors
                 )
                 industry_chart.update_traces(textposition='inside', textinfo='percent+label')
             else:
@@ -285,7 +356,7 @@ class VisualizationGenerator:
                     y='client_count',
                     title='Client Distribution by Size',
                     color='size',
-                    color_discrete_sequence=self.color_schemes['categorical']
+                    color_discrete_sequence=self._categorical_colors
                 )
                 size_chart.update_layout(
                     xaxis_title='Size',
@@ -302,7 +373,7 @@ class VisualizationGenerator:
                     y='total_revenue',
                     title='Client Spending by Industry',
                     color='industry',
-                    color_discrete_sequence=self.color_schemes['categorical'],
+                    color_discrete_sequence=self._categorical_colors,
                     text='total_revenue'
                 )
                 industry_spending_chart.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
@@ -470,7 +541,7 @@ class VisualizationGenerator:
                     values='program_count', 
                     names='category',
                     title='Program Distribution by Category',
-                    color_discrete_sequence=self.color_schemes['categorical']
+                    color_discrete_sequence=self._categorical_colors
                 )
                 category_chart.update_traces(textposition='inside', textinfo='percent+label')
             else:
@@ -484,7 +555,7 @@ class VisualizationGenerator:
                     y='program_count',
                     title='Program Distribution by Delivery Mode',
                     color='delivery_mode',
-                    color_discrete_sequence=self.color_schemes['categorical']
+                    color_discrete_sequence=self._categorical_colors
                 )
                 delivery_chart.update_layout(
                     xaxis_title='Delivery Mode',
@@ -690,7 +761,7 @@ class VisualizationGenerator:
                     y='potential_revenue',
                     title='Pipeline Value by Stage',
                     color='stage',
-                    color_discrete_sequence=self.color_schemes['categorical'],
+                    color_discrete_sequence=self._categorical_colors,
                     text='potential_revenue'
                 )
                 value_chart.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
@@ -911,7 +982,7 @@ class VisualizationGenerator:
                     values='total_cost', 
                     names='cost_type',
                     title='Cost Breakdown',
-                    color_discrete_sequence=self.color_schemes['categorical']
+                    color_discrete_sequence=self._categorical_colors
                 )
                 cost_chart.update_traces(textposition='inside', textinfo='percent+label')
             else:
@@ -1261,7 +1332,7 @@ class VisualizationGenerator:
                         y=y_col,
                         title=f"Top {dimension.capitalize()} by {metric.replace('_', ' ').capitalize()}",
                         color=x_col,
-                        color_discrete_sequence=self.color_schemes['categorical']
+                        color_discrete_sequence=self._categorical_colors
                     )
                     chart.update_layout(
                         xaxis_title=dimension.capitalize(),
@@ -1307,7 +1378,7 @@ class VisualizationGenerator:
                         values=value_col,
                         names=dimension,
                         title=f"{metric.replace('_', ' ').capitalize()} Distribution by {dimension.capitalize()}",
-                        color_discrete_sequence=self.color_schemes['categorical']
+                        color_discrete_sequence=self._categorical_colors
                     )
                     chart.update_traces(textposition='inside', textinfo='percent+label')
                 
@@ -1374,7 +1445,7 @@ class VisualizationGenerator:
                             y=f"total_{metric}" if metric in ['revenue', 'profit'] else metric,
                             title=f"{metric.replace('_', ' ').capitalize()} Comparison by {dimension.capitalize()}",
                             color=dimension,
-                            color_discrete_sequence=self.color_schemes['categorical']
+                            color_discrete_sequence=self._categorical_colors
                         )
                         chart.update_layout(
                             xaxis_title=dimension.capitalize(),
@@ -1496,23 +1567,23 @@ class VisualizationGenerator:
                     
                     # Add chart data
                     if 'revenue_chart' in dashboard_data and dashboard_data['revenue_chart']:
-                        report_content += f"var revenueChart = {dashboard_data['revenue_chart'].to_json()};\n"
+                        report_content += f"var revenueChart = {_figure_to_json(dashboard_data['revenue_chart'])};\n"
                         report_content += "Plotly.newPlot('revenue-chart', revenueChart.data, revenueChart.layout);\n"
                     
                     if 'programs_chart' in dashboard_data and dashboard_data['programs_chart']:
-                        report_content += f"var programsChart = {dashboard_data['programs_chart'].to_json()};\n"
+                        report_content += f"var programsChart = {_figure_to_json(dashboard_data['programs_chart'])};\n"
                         report_content += "Plotly.newPlot('programs-chart', programsChart.data, programsChart.layout);\n"
                     
                     if 'clients_chart' in dashboard_data and dashboard_data['clients_chart']:
-                        report_content += f"var clientsChart = {dashboard_data['clients_chart'].to_json()};\n"
+                        report_content += f"var clientsChart = {_figure_to_json(dashboard_data['clients_chart'])};\n"
                         report_content += "Plotly.newPlot('clients-chart', clientsChart.data, clientsChart.layout);\n"
                     
                     if 'funnel_chart' in pipeline_data and pipeline_data['funnel_chart']:
-                        report_content += f"var pipelineChart = {pipeline_data['funnel_chart'].to_json()};\n"
+                        report_content += f"var pipelineChart = {_figure_to_json(pipeline_data['funnel_chart'])};\n"
                         report_content += "Plotly.newPlot('pipeline-chart', pipelineChart.data, pipelineChart.layout);\n"
                     
                     if 'trends_chart' in profitability_data and profitability_data['trends_chart']:
-                        report_content += f"var profitabilityChart = {profitability_data['trends_chart'].to_json()};\n"
+                        report_content += f"var profitabilityChart = {_figure_to_json(profitability_data['trends_chart'])};\n"
                         report_content += "Plotly.newPlot('profitability-chart', profitabilityChart.data, profitabilityChart.layout);\n"
                     
                     report_content += """
@@ -1632,7 +1703,7 @@ class VisualizationGenerator:
                         values='enrollment_count',
                         names='category',
                         title='Program Category Preferences',
-                        color_discrete_sequence=self.color_schemes['categorical']
+                        color_discrete_sequence=self._categorical_colors
                     )
                     preferences_chart.update_traces(textposition='inside', textinfo='percent+label')
                     report_data['preferences_chart'] = preferences_chart
@@ -1775,11 +1846,11 @@ class VisualizationGenerator:
                     
                     # Add chart data
                     if 'spending_chart' in report_data:
-                        report_content += f"var spendingChart = {report_data['spending_chart'].to_json()};\n"
+                        report_content += f"var spendingChart = {_figure_to_json(report_data['spending_chart'])};\n"
                         report_content += "Plotly.newPlot('spending-chart', spendingChart.data, spendingChart.layout);\n"
                     
                     if 'preferences_chart' in report_data:
-                        report_content += f"var preferencesChart = {report_data['preferences_chart'].to_json()};\n"
+                        report_content += f"var preferencesChart = {_figure_to_json(report_data['preferences_chart'])};\n"
                         report_content += "Plotly.newPlot('preferences-chart', preferencesChart.data, preferencesChart.layout);\n"
                     
                     report_content += """
@@ -1790,385 +1861,43 @@ class VisualizationGenerator:
             
             elif report_type == 'program' and entity_id:
                 # Generate program report
-                query = f"SELECT * FROM programs WHERE program_id = {entity_id}"
-                program_info = pd.read_sql(query, self.conn)
+                report_data = self._build_program_report_data(entity_id)
                 
-                if program_info.empty:
+                if report_data is None:
                     return {'error': f"Program with ID {entity_id} not found"}
                 
-                # Get program enrollments
-                query = f"""
-                SELECT 
-                    e.enrollment_id,
-                    c.name as client_name,
-                    e.start_date,
-                    e.end_date,
-                    e.delivery_mode,
-                    e.num_participants,
-                    e.revenue,
-                    e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost as total_costs,
-                    e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost) as profit,
-                    CASE 
-                        WHEN e.revenue > 0 
-                        THEN (e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost)) / e.revenue * 100 
-                        ELSE 0 
-                    END as profit_margin,
-                    e.status,
-                    e.feedback_score
-                FROM enrollments e
-                JOIN clients c ON e.client_id = c.client_id
-                WHERE e.program_id = {entity_id}
-                ORDER BY e.start_date DESC
-                """
-                enrollments = pd.read_sql(query, self.conn)
-                
-                # Get program opportunities
-                query = f"""
-                SELECT 
-                    o.opportunity_id,
-                    c.name as client_name,
-                    o.potential_revenue,
-                    o.stage,
-                    o.probability,
-                    o.expected_close_date,
-                    o.actual_close_date,
-                    o.created_date,
-                    o.owner
-                FROM opportunities o
-                JOIN clients c ON o.client_id = c.client_id
-                WHERE o.program_id = {entity_id}
-                ORDER BY o.created_date DESC
-                """
-                opportunities = pd.read_sql(query, self.conn)
-                
-                # Get enrollment trends over time
-                query = f"""
-                SELECT 
-                    strftime('%Y-%m', e.start_date) as month,
-                    COUNT(e.enrollment_id) as enrollment_count,
-                    SUM(e.revenue) as total_revenue,
-                    SUM(e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost) as total_costs,
-                    SUM(e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost)) as total_profit,
-                    CASE 
-                        WHEN SUM(e.revenue) > 0 
-                        THEN (SUM(e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost)) / SUM(e.revenue)) * 100 
-                        ELSE 0 
-                    END as profit_margin
-                FROM enrollments e
-                WHERE e.program_id = {entity_id} AND e.start_date IS NOT NULL
-                GROUP BY month
-                ORDER BY month
-                """
-                enrollment_trends = pd.read_sql(query, self.conn)
-                
-                # Get client distribution
-                query = f"""
-                SELECT 
-                    c.industry,
-                    COUNT(e.enrollment_id) as enrollment_count,
-                    SUM(e.revenue) as total_revenue
-                FROM enrollments e
-                JOIN clients c ON e.client_id = c.client_id
-                WHERE e.program_id = {entity_id} AND c.industry IS NOT NULL
-                GROUP BY c.industry
-                ORDER BY enrollment_count DESC
-                """
-                client_distribution = pd.read_sql(query, self.conn)
-                
-                # Get cost breakdown
-                query = f"""
-                SELECT 
-                    'Trainer Cost' as cost_type,
-                    SUM(trainer_cost) as total_cost,
-                    (SUM(trainer_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
-                FROM enrollments
-                WHERE program_id = {entity_id}
-                UNION ALL
-                SELECT 
-                    'Logistics Cost' as cost_type,
-                    SUM(logistics_cost) as total_cost,
-                    (SUM(logistics_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
-                FROM enrollments
-                WHERE program_id = {entity_id}
-                UNION ALL
-                SELECT 
-                    'Venue Cost' as cost_type,
-                    SUM(venue_cost) as total_cost,
-                    (SUM(venue_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
-                FROM enrollments
-                WHERE program_id = {entity_id}
-                UNION ALL
-                SELECT 
-                    'Utilities Cost' as cost_type,
-                    SUM(utilities_cost) as total_cost,
-                    (SUM(utilities_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
-                FROM enrollments
-                WHERE program_id = {entity_id}
-                UNION ALL
-                SELECT 
-                    'Materials Cost' as cost_type,
-                    SUM(materials_cost) as total_cost,
-                    (SUM(materials_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
-                FROM enrollments
-                WHERE program_id = {entity_id}
-                ORDER BY total_cost DESC
-                """
-                cost_breakdown = pd.read_sql(query, self.conn)
-                
-                report_data = {
-                    'program_info': program_info,
-                    'enrollments': enrollments,
-                    'opportunities': opportunities,
-                    'enrollment_trends': enrollment_trends,
-                    'client_distribution': client_distribution,
-                    'cost_breakdown': cost_breakdown
-                }
-                
-                # Create charts
-                if not enrollment_trends.empty:
-                    # Create figure with secondary y-axis
-                    trends_chart = make_subplots(specs=[[{"secondary_y": True}]])
-                    
-                    # Add revenue and cost bars
-                    trends_chart.add_trace(
-                        go.Bar(
-                            x=enrollment_trends['month'],
-                            y=enrollment_trends['total_revenue'],
-                            name='Revenue',
-                            marker_color=self.color_schemes['revenue']
-                        ),
-                        secondary_y=False
-                    )
-                    
-                    trends_chart.add_trace(
-                        go.Bar(
-                            x=enrollment_trends['month'],
-                            y=enrollment_trends['total_costs'],
-                            name='Costs',
-                            marker_color=self.color_schemes['cost']
-                        ),
-                        secondary_y=False
-                    )
-                    
-                    # Add profit margin line
-                    trends_chart.add_trace(
-                        go.Scatter(
-                            x=enrollment_trends['month'],
-                            y=enrollment_trends['profit_margin'],
-                            name='Profit Margin (%)',
-                            line=dict(color=self.color_schemes['margin'], width=3),
-                            mode='lines+markers'
-                        ),
-                        secondary_y=True
-                    )
-                    
-                    # Update layout
-                    trends_chart.update_layout(
-                        title='Program Performance Over Time',
-                        xaxis_title='Month',
-                        barmode='group',
-                        legend=dict(
-                            orientation="h",
-                            yanchor="bottom",
-                            y=1.02,
-                            xanchor="right",
-                            x=1
-                        )
-                    )
-                    
-                    # Set y-axes titles
-                    trends_chart.update_yaxes(title_text="Amount ($)", secondary_y=False)
-                    trends_chart.update_yaxes(title_text="Profit Margin (%)", secondary_y=True)
-                    
-                    report_data['trends_chart'] = trends_chart
-                
-                if not client_distribution.empty:
-                    client_chart = px.pie(
-                        client_distribution,
-                        values='enrollment_count',
-                        names='industry',
-                        title='Client Industry Distribution',
-                        color_discrete_sequence=self.color_schemes['categorical']
-                    )
-                    client_chart.update_traces(textposition='inside', textinfo='percent+label')
-                    report_data['client_chart'] = client_chart
-                
-                if not cost_breakdown.empty:
-                    cost_chart = px.pie(
-                        cost_breakdown,
-                        values='total_cost',
-                        names='cost_type',
-                        title='Cost Breakdown',
-                        color_discrete_sequence=self.color_schemes['categorical']
-                    )
-                    cost_chart.update_traces(textposition='inside', textinfo='percent+label')
-                    report_data['cost_chart'] = cost_chart
-                
                 # Generate HTML report
                 if format == 'html':
-                    program_name = program_info['name'].iloc[0]
-                    program_category = program_info['category'].iloc[0] if 'category' in program_info and not pd.isna(program_info['category'].iloc[0]) else 'N/A'
-                    program_delivery = program_info['delivery_mode'].iloc[0] if 'delivery_mode' in program_info and not pd.isna(program_info['delivery_mode'].iloc[0]) else 'N/A'
-                    program_duration = program_info['duration'].iloc[0] if 'duration' in program_info and not pd.isna(program_info['duration'].iloc[0]) else 'N/A'
-                    
-                    report_content = f"""
-                    <html>
-                    <head>
-                        <title>Program Report: {program_name}</title>
-                        <style>
-                            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                            h1 {{ color: #2c3e50; }}
-                            h2 {{ color: #3498db; margin-top: 30px; }}
-                            .program-info {{ display: flex; flex-wrap: wrap; gap: 20px; margin: 20px 0; }}
-                            .info-box {{ background-color: #f8f9fa; border-radius: 5px; padding: 15px; min-width: 200px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }}
-                            .info-label {{ font-size: 14px; color: #7f8c8d; }}
-                            .info-value {{ font-size: 18px; color: #2c3e50; }}
-                            .chart-container {{ margin: 30px 0; }}
-                            table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
-                            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                            th {{ background-color: #f2f2f2; }}
-                            tr:nth-child(even) {{ background-color: #f9f9f9; }}
-                        </style>
-                    </head>
-                    <body>
-                        <h1>Program Report: {program_name}</h1>
-                        
-                        <h2>Program Information</h2>
-                        <div class="program-info">
-                            <div class="info-box">
-                                <div class="info-label">Category</div>
-                                <div class="info-value">{program_category}</div>
-                            </div>
-                            <div class="info-box">
-                                <div class="info-label">Delivery Mode</div>
-                                <div class="info-value">{program_delivery}</div>
-                            </div>
-                            <div class="info-box">
-                                <div class="info-label">Duration (hours)</div>
-                                <div class="info-value">{program_duration}</div>
-                            </div>
-                        </div>
-                        
-                        <h2>Performance Over Time</h2>
-                        <div class="chart-container" id="trends-chart"></div>
-                        
-                        <h2>Client Industry Distribution</h2>
-                        <div class="chart-container" id="client-chart"></div>
-                        
-                        <h2>Cost Breakdown</h2>
-                        <div class="chart-container" id="cost-chart"></div>
-                        
-                        <h2>Enrollment History</h2>
-                    """
-                    
-                    if not enrollments.empty:
-                        report_content += """
-                        <table>
-                            <tr>
-                                <th>Client</th>
-                                <th>Start Date</th>
-                                <th>Delivery Mode</th>
-                                <th>Participants</th>
-                                <th>Revenue</th>
-                                <th>Profit</th>
-                                <th>Margin</th>
-                            </tr>
-                        """
-                        
-                        for _, row in enrollments.iterrows():
-                            start_date = row['start_date'] if not pd.isna(row['start_date']) else 'N/A'
-                            delivery_mode = row['delivery_mode'] if not pd.isna(row['delivery_mode']) else 'N/A'
-                            participants = int(row['num_participants']) if not pd.isna(row['num_participants']) else 'N/A'
-                            revenue = f"${row['revenue']:,.2f}" if not pd.isna(row['revenue']) else 'N/A'
-                            profit = f"${row['profit']:,.2f}" if not pd.isna(row['profit']) else 'N/A'
-                            margin = f"{row['profit_margin']:.1f}%" if not pd.isna(row['profit_margin']) else 'N/A'
-                            
-                            report_content += f"""
-                            <tr>
-                                <td>{row['client_name']}</td>
-                                <td>{start_date}</td>
-                                <td>{delivery_mode}</td>
-                                <td>{participants}</td>
-                                <td>{revenue}</td>
-                                <td>{profit}</td>
-                                <td>{margin}</td>
-                            </tr>
-                            """
-                        
-                        report_content += "</table>"
-                    else:
-                        report_content += "<p>No enrollment history found.</p>"
-                    
-                    report_content += """
-                        <h2>Opportunity Pipeline</h2>
-                    """
-                    
-                    if not opportunities.empty:
-                        report_content += """
-                        <table>
-                            <tr>
-                                <th>Client</th>
-                                <th>Stage</th>
-                                <th>Potential Revenue</th>
-                                <th>Probability</th>
-                                <th>Expected Close</th>
-                                <th>Owner</th>
-                            </tr>
-                        """
-                        
-                        for _, row in opportunities.iterrows():
-                            stage = row['stage'] if not pd.isna(row['stage']) else 'N/A'
-                            potential_revenue = f"${row['potential_revenue']:,.2f}" if not pd.isna(row['potential_revenue']) else 'N/A'
-                            probability = f"{row['probability']}%" if not pd.isna(row['probability']) else 'N/A'
-                            expected_close = row['expected_close_date'] if not pd.isna(row['expected_close_date']) else 'N/A'
-                            owner = row['owner'] if not pd.isna(row['owner']) else 'N/A'
-                            
-                            report_content += f"""
-                            <tr>
-                                <td>{row['client_name']}</td>
-                                <td>{stage}</td>
-                                <td>{potential_revenue}</td>
-                                <td>{probability}</td>
-                                <td>{expected_close}</td>
-                                <td>{owner}</td>
-                            </tr>
-                            """
-                        
-                        report_content += "</table>"
-                    else:
-                        report_content += "<p>No opportunities found.</p>"
-                    
-                    report_content += """
-                        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-                        <script>
-                    """
-                    
-                    # Add chart data
-                    if 'trends_chart' in report_data:
-                        report_content += f"var trendsChart = {report_data['trends_chart'].to_json()};\n"
-                        report_content += "Plotly.newPlot('trends-chart', trendsChart.data, trendsChart.layout);\n"
-                    
-                    if 'client_chart' in report_data:
-                        report_content += f"var clientChart = {report_data['client_chart'].to_json()};\n"
-                        report_content += "Plotly.newPlot('client-chart', clientChart.data, clientChart.layout);\n"
-                    
-                    if 'cost_chart' in report_data:
-                        report_content += f"var costChart = {report_data['cost_chart'].to_json()};\n"
-                        report_content += "Plotly.newPlot('cost-chart', costChart.data, costChart.layout);\n"
-                    
-                    report_content += """
-                        </script>
-                    </body>
-                    </html>
-                    """
+                    report_content = ''.join(self._iter_program_report_html(report_data))
             
             # For Excel format, convert data to Excel file
             if format == 'excel' and report_data:
+                # Only DataFrames become sheets; figures and nested dicts are skipped
+                frames = {key: value for key, value in report_data.items() if isinstance(value, pd.DataFrame)}
+                if not frames:
+                    return {
+                        'data': report_data,
+                        'content': '',
+                        'format': format
+                    }
+                
+                # Excel sheet names are limited to 31 chars and compared case-insensitively,
+                # so de-duplicate truncated keys up front rather than failing mid-write
+                sheet_names = {}
+                used_names = set()
+                for key in frames:
+                    name = key[:31]
+                    suffix = 1
+                    while name.lower() in used_names:
+                        name = f"{key[:31 - len(str(suffix)) - 1]}_{suffix}"
+                        suffix += 1
+                    used_names.add(name.lower())
+                    sheet_names[key] = name
+                
                 output = io.BytesIO()
                 with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    for key, value in report_data.items():
-                        if isinstance(value, pd.DataFrame):
-                            value.to_excel(writer, sheet_name=key[:31])  # Excel sheet names limited to 31 chars
+                    for key, value in frames.items():
+                        value.to_excel(writer, sheet_name=sheet_names[key])
                 
                 output.seek(0)
                 report_content = base64.b64encode(output.read()).decode('utf-8')
@@ -2181,6 +1910,362 @@ class VisualizationGenerator:
         except Exception as e:
             return {'error': str(e)}
     
+    def stream_program_report(self, program_id):
+        """
+        Stream the HTML program report chunk by chunk
+        
+        Args:
+            program_id: ID of the program to report on
+            
+        Returns:
+            generator: HTML fragments (head, info, charts, one per table row, footer)
+        """
+        report_data = self._build_program_report_data(program_id)
+        
+        if report_data is None:
+            raise ValueError(f"Program with ID {program_id} not found")
+        
+        return self._iter_program_report_html(report_data)
+    
+    def _build_program_report_data(self, entity_id):
+        """Query the data and build the charts for a program report, or return None if the program does not exist"""
+        query = f"SELECT * FROM programs WHERE program_id = {entity_id}"
+        program_info = pd.read_sql(query, self.conn)
+        
+        if program_info.empty:
+            return None
+        
+        # Get program enrollments
+        query = f"""
+        SELECT 
+            e.enrollment_id,
+            c.name as client_name,
+            e.start_date,
+            e.end_date,
+            e.delivery_mode,
+            e.num_participants,
+            e.revenue,
+            e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost as total_costs,
+            e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost) as profit,
+            CASE 
+                WHEN e.revenue > 0 
+                THEN (e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost)) / e.revenue * 100 
+                ELSE 0 
+            END as profit_margin,
+            e.status,
+            e.feedback_score
+        FROM enrollments e
+        JOIN clients c ON e.client_id = c.client_id
+        WHERE e.program_id = {entity_id}
+        ORDER BY e.start_date DESC
+        """
+        enrollments = pd.read_sql(query, self.conn)
+        
+        # Get program opportunities
+        query = f"""
+        SELECT 
+            o.opportunity_id,
+            c.name as client_name,
+            o.potential_revenue,
+            o.stage,
+            o.probability,
+            o.expected_close_date,
+            o.actual_close_date,
+            o.created_date,
+            o.owner
+        FROM opportunities o
+        JOIN clients c ON o.client_id = c.client_id
+        WHERE o.program_id = {entity_id}
+        ORDER BY o.created_date DESC
+        """
+        opportunities = pd.read_sql(query, self.conn)
+        
+        # Get enrollment trends over time
+        query = f"""
+        SELECT 
+            strftime('%Y-%m', e.start_date) as month,
+            COUNT(e.enrollment_id) as enrollment_count,
+            SUM(e.revenue) as total_revenue,
+            SUM(e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost) as total_costs,
+            SUM(e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost)) as total_profit,
+            CASE 
+                WHEN SUM(e.revenue) > 0 
+                THEN (SUM(e.revenue - (e.trainer_cost + e.logistics_cost + e.venue_cost + e.utilities_cost + e.materials_cost)) / SUM(e.revenue)) * 100 
+                ELSE 0 
+            END as profit_margin
+        FROM enrollments e
+        WHERE e.program_id = {entity_id} AND e.start_date IS NOT NULL
+        GROUP BY month
+        ORDER BY month
+        """
+        enrollment_trends = pd.read_sql(query, self.conn)
+        
+        # Get client distribution
+        query = f"""
+        SELECT 
+            c.industry,
+            COUNT(e.enrollment_id) as enrollment_count,
+            SUM(e.revenue) as total_revenue
+        FROM enrollments e
+        JOIN clients c ON e.client_id = c.client_id
+        WHERE e.program_id = {entity_id} AND c.industry IS NOT NULL
+        GROUP BY c.industry
+        ORDER BY enrollment_count DESC
+        """
+        client_distribution = pd.read_sql(query, self.conn)
+        
+        # Get cost breakdown
+        query = f"""
+        SELECT 
+            'Trainer Cost' as cost_type,
+            SUM(trainer_cost) as total_cost,
+            (SUM(trainer_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
+        FROM enrollments
+        WHERE program_id = {entity_id}
+        UNION ALL
+        SELECT 
+            'Logistics Cost' as cost_type,
+            SUM(logistics_cost) as total_cost,
+            (SUM(logistics_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
+        FROM enrollments
+        WHERE program_id = {entity_id}
+        UNION ALL
+        SELECT 
+            'Venue Cost' as cost_type,
+            SUM(venue_cost) as total_cost,
+            (SUM(venue_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
+        FROM enrollments
+        WHERE program_id = {entity_id}
+        UNION ALL
+        SELECT 
+            'Utilities Cost' as cost_type,
+            SUM(utilities_cost) as total_cost,
+            (SUM(utilities_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
+        FROM enrollments
+        WHERE program_id = {entity_id}
+        UNION ALL
+        SELECT 
+            'Materials Cost' as cost_type,
+            SUM(materials_cost) as total_cost,
+            (SUM(materials_cost) / SUM(trainer_cost + logistics_cost + venue_cost + utilities_cost + materials_cost)) * 100 as percentage
+        FROM enrollments
+        WHERE program_id = {entity_id}
+        ORDER BY total_cost DESC
+        """
+        cost_breakdown = pd.read_sql(query, self.conn)
+        
+        report_data = {
+            'program_info': program_info,
+            'enrollments': enrollments,
+            'opportunities': opportunities,
+            'enrollment_trends': enrollment_trends,
+            'client_distribution': client_distribution,
+            'cost_breakdown': cost_breakdown
+        }
+        
+        # Create charts
+        if not enrollment_trends.empty:
+            # Start from the shared layout prototype and only add this program's traces
+            trends_chart = go.Figure(_trends_prototype())
+            trends_chart.add_traces(
+                [
+                    go.Bar(
+                        x=enrollment_trends['month'],
+                        y=enrollment_trends['total_revenue'],
+                        name='Revenue',
+                        marker_color=self.color_schemes['revenue']
+                    ),
+                    go.Bar(
+                        x=enrollment_trends['month'],
+                        y=enrollment_trends['total_costs'],
+                        name='Costs',
+                        marker_color=self.color_schemes['cost']
+                    ),
+                    # Profit margin line
+                    go.Scatter(
+                        x=enrollment_trends['month'],
+                        y=enrollment_trends['profit_margin'],
+                        name='Profit Margin (%)',
+                        line=dict(color=self.color_schemes['margin'], width=3),
+                        mode='lines+markers'
+                    )
+                ],
+                rows=[1, 1, 1],
+                cols=[1, 1, 1],
+                secondary_ys=[False, False, True]
+            )
+            
+            report_data['trends_chart'] = trends_chart
+        
+        if not client_distribution.empty:
+            client_chart = px.pie(
+                client_distribution,
+                values='enrollment_count',
+                names='industry',
+                title='Client Industry Distribution',
+                color_discrete_sequence=self._categorical_colors
+            )
+            client_chart.update_traces(textposition='inside', textinfo='percent+label')
+            report_data['client_chart'] = client_chart
+        
+        if not cost_breakdown.empty:
+            cost_chart = px.pie(
+                cost_breakdown,
+                values='total_cost',
+                names='cost_type',
+                title='Cost Breakdown',
+                color_discrete_sequence=self._categorical_colors
+            )
+            cost_chart.update_traces(textposition='inside', textinfo='percent+label')
+            report_data['cost_chart'] = cost_chart
+        
+        return report_data
+    
+    def _iter_program_report_html(self, report_data):
+        """Yield the HTML of a program report built by _build_program_report_data"""
+        program_info = report_data['program_info']
+        enrollments = report_data['enrollments']
+        opportunities = report_data['opportunities']
+        
+        # One namedtuple for the program row instead of a Series plus per-column indexing
+        row = next(program_info.itertuples(index=False))
+        program_name = row.name
+        program_category = 'N/A' if pd.isna(getattr(row, 'category', None)) else row.category
+        program_delivery = 'N/A' if pd.isna(getattr(row, 'delivery_mode', None)) else row.delivery_mode
+        program_duration = 'N/A' if pd.isna(getattr(row, 'duration', None)) else row.duration
+        
+        # Every database text value is escaped before it is interpolated into the report
+        program_name, program_category, program_delivery, program_duration = (
+            html.escape(str(value)) for value in (program_name, program_category, program_delivery, program_duration)
+        )
+        
+        yield _PROGRAM_REPORT_HEAD.format(program_name=program_name)
+        yield f"""
+            
+            <h2>Program Information</h2>
+            <div class="program-info">
+                <div class="info-box">
+                    <div class="info-label">Category</div>
+                    <div class="info-value">{program_category}</div>
+                </div>
+                <div class="info-box">
+                    <div class="info-label">Delivery Mode</div>
+                    <div class="info-value">{program_delivery}</div>
+                </div>
+                <div class="info-box">
+                    <div class="info-label">Duration (hours)</div>
+                    <div class="info-value">{program_duration}</div>
+                </div>
+            </div>
+            
+            <h2>Performance Over Time</h2>
+            <div class="chart-container" id="trends-chart"></div>
+            
+            <h2>Client Industry Distribution</h2>
+            <div class="chart-container" id="client-chart"></div>
+            
+            <h2>Cost Breakdown</h2>
+            <div class="chart-container" id="cost-chart"></div>
+            
+            <h2>Enrollment History</h2>
+        """
+        
+        if not enrollments.empty:
+            yield """
+            <table>
+                <tr>
+                    <th>Client</th>
+                    <th>Start Date</th>
+                    <th>Delivery Mode</th>
+                    <th>Participants</th>
+                    <th>Revenue</th>
+                    <th>Profit</th>
+                    <th>Margin</th>
+                </tr>
+            """
+            
+            # Format every column up front so the row loop is plain string assembly
+            enrollment_rows = pd.DataFrame({
+                'client_name': enrollments['client_name'].astype(str).map(html.escape),
+                'start_date': enrollments['start_date'].fillna('N/A').astype(str).map(html.escape),
+                'delivery_mode': enrollments['delivery_mode'].fillna('N/A').astype(str).map(html.escape),
+                'participants': enrollments['num_participants'].map(lambda value: str(int(value)), na_action='ignore').fillna('N/A'),
+                'revenue': enrollments['revenue'].map('${:,.2f}'.format, na_action='ignore').fillna('N/A'),
+                'profit': enrollments['profit'].map('${:,.2f}'.format, na_action='ignore').fillna('N/A'),
+                'margin': enrollments['profit_margin'].map('{:.1f}%'.format, na_action='ignore').fillna('N/A')
+            })
+
+            for record in enrollment_rows.to_dict('records'):
+                yield _ENROLL_ROW_TPL.format_map(record)
+            
+            yield "</table>"
+        else:
+            yield "<p>No enrollment history found.</p>"
+        
+        yield """
+            <h2>Opportunity Pipeline</h2>
+        """
+        
+        if not opportunities.empty:
+            yield """
+            <table>
+                <tr>
+                    <th>Client</th>
+                    <th>Stage</th>
+                    <th>Potential Revenue</th>
+                    <th>Probability</th>
+                    <th>Expected Close</th>
+                    <th>Owner</th>
+                </tr>
+            """
+            
+            for _, row in opportunities.iterrows():
+                client_name = html.escape(str(row['client_name']))
+                stage = html.escape(str(row['stage'])) if not pd.isna(row['stage']) else 'N/A'
+                potential_revenue = f"${row['potential_revenue']:,.2f}" if not pd.isna(row['potential_revenue']) else 'N/A'
+                probability = f"{row['probability']}%" if not pd.isna(row['probability']) else 'N/A'
+                expected_close = html.escape(str(row['expected_close_date'])) if not pd.isna(row['expected_close_date']) else 'N/A'
+                owner = html.escape(str(row['owner'])) if not pd.isna(row['owner']) else 'N/A'
+                
+                yield f"""
+                <tr>
+                    <td>{client_name}</td>
+                    <td>{stage}</td>
+                    <td>{potential_revenue}</td>
+                    <td>{probability}</td>
+                    <td>{expected_close}</td>
+                    <td>{owner}</td>
+                </tr>
+                """
+            
+            yield "</table>"
+        else:
+            yield "<p>No opportunities found.</p>"
+        
+        yield """
+            <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+            <script>
+        """
+        
+        # Add chart data
+        if 'trends_chart' in report_data:
+            yield f"var trendsChart = {_figure_to_json(report_data['trends_chart'])};\n"
+            yield "Plotly.newPlot('trends-chart', trendsChart.data, trendsChart.layout);\n"
+        
+        if 'client_chart' in report_data:
+            yield f"var clientChart = {_figure_to_json(report_data['client_chart'])};\n"
+            yield "Plotly.newPlot('client-chart', clientChart.data, clientChart.layout);\n"
+        
+        if 'cost_chart' in report_data:
+            yield f"var costChart = {_figure_to_json(report_data['cost_chart'])};\n"
+            yield "Plotly.newPlot('cost-chart', costChart.data, costChart.layout);\n"
+        
+        yield """
+            </script>
+        </body>
+        </html>
+        """
+    
     def close(self):
         """Close the database connection"""
         if hasattr(self, 'conn') and self.conn: